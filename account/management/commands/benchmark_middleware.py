@@ -0,0 +1,93 @@
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.shortcuts import redirect
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.contrib import messages
+from account.middleware import AccountCheckMiddleWare
+
+
+class LegacyAccountCheckMiddleWare(AccountCheckMiddleWare):
+    """The reverse()-per-request implementation, kept as the benchmark baseline"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        modulename = view_func.__module__
+        user = request.user
+        voter_id = request.session.get('voter_id')
+
+        if user.is_authenticated:
+            if user.user_type == '1':  # Admin
+                if modulename == 'voting.views':
+                    if request.path == reverse('fetch_ballot'):
+                        pass
+                    elif request.path == reverse('index'):
+                        pass
+                    else:
+                        messages.error(request, "You do not have access to this resource")
+                        return redirect(reverse('adminDashboard'))
+
+        elif voter_id:
+            # Voter
+            if modulename == 'administrator.views':
+                messages.error(request, "You do not have access to this resource")
+                return redirect(reverse('voterDashboard'))
+
+        else:
+            # Guest
+            if request.path == reverse('account_login') or request.path == reverse('voter_login') or modulename == 'django.contrib.auth.views' or modulename == 'voting.views':
+                pass
+            else:
+                return redirect(reverse('voter_login'))
+
+
+class BenchmarkAdmin:
+    is_authenticated = True
+    user_type = '1'
+
+
+class Command(BaseCommand):
+    help = "Time AccountCheckMiddleWare.process_view against the legacy implementation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        factory = RequestFactory()
+        paths = [
+            reverse('index'), reverse('fetch_ballot'), reverse('show_ballot', args=[1]),
+            reverse('account_login'), reverse('adminDashboard'), reverse('viewVotes'),
+        ]
+        roles = {
+            'admin': (BenchmarkAdmin(), {}),
+            'voter': (AnonymousUser(), {'voter_id': 1}),
+            'guest': (AnonymousUser(), {}),
+        }
+        requests = []
+        for role, (user, session_data) in roles.items():
+            for path in paths:
+                request = factory.get(path)
+                request.user = user
+                request.session = SessionBase()
+                request.session.update(session_data)
+                request._messages = FallbackStorage(request)
+                match = resolve(path)
+                requests.append((request, match.func, match.args, match.kwargs))
+
+        get_response = lambda request: None
+        for label, middleware in [
+            ('legacy', LegacyAccountCheckMiddleWare(get_response)),
+            ('route table', AccountCheckMiddleWare(get_response)),
+        ]:
+            for request, func, args, kwargs in requests:
+                middleware.process_view(request, func, args, kwargs)  # warm up
+            start = time.perf_counter()
+            for _ in range(iterations):
+                for request, func, args, kwargs in requests:
+                    middleware.process_view(request, func, args, kwargs)
+            elapsed = time.perf_counter() - start
+            per_call = elapsed / (iterations * len(requests)) * 1e6
+            self.stdout.write(f"{label:12} {per_call:8.2f} us/request  ({iterations * len(requests)} calls)")
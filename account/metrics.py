@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger('e_voting.requests')
+
+# Latencies kept per view for the percentiles on the stats endpoint
+SAMPLE_SIZE = 1000
+
+
+class QueryRecorder:
+    """Database execute wrapper that times and counts the queries of one request
+
+    A query whose SQL was already run in the same request counts as a
+    duplicate; a view with many of them is usually an N+1.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duplicates = 0
+        self.time = 0.0
+        self.seen = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            if sql in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(sql)
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.wall = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.duplicates = 0
+        self.bytes = 0
+        self.latencies = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, record):
+        self.requests += 1
+        self.wall += record['wall_ms']
+        self.db += record['db_ms']
+        self.queries += record['queries']
+        self.max_queries = max(self.max_queries, record['queries'])
+        self.duplicates += record['duplicate_queries']
+        self.bytes += record['response_bytes'] or 0
+        self.latencies.append(record['wall_ms'])
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': self.requests,
+            'avg_ms': round(self.wall / self.requests, 3),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'avg_db_ms': round(self.db / self.requests, 3),
+            'avg_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'avg_duplicate_queries': round(self.duplicates / self.requests, 2),
+            'avg_response_bytes': round(self.bytes / self.requests),
+        }
+
+
+class RequestMetrics:
+    """Per-process aggregates of request records, keyed by URL name"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def record(self, record):
+        with self.lock:
+            self.views[record['view']].add(record)
+        logger.info(json.dumps(record))
+
+    def snapshot(self):
+        with self.lock:
+            return {view: stats.as_dict() for view, stats in sorted(self.views.items())}
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+metrics = RequestMetrics()
@@ -1,37 +1,123 @@
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
-from django.urls import reverse
+from django.urls import reverse, get_resolver, URLPattern, URLResolver
 from django.shortcuts import redirect
 from django.contrib import messages
+from .metrics import QueryRecorder, metrics
+
+# Who may reach a view: admins, voters (voter_id in session) and guests
+RoutePolicy = namedtuple('RoutePolicy', ['admin', 'voter', 'guest'])
+
+# voting.views pages an admin may still open
+ADMIN_VOTING_VIEWS = {'fetch_ballot', 'index'}
+# Pages a guest may open outside voting.views and django.contrib.auth.views
+GUEST_VIEWS = {'account_login', 'voter_login'}
+
+
+def iter_url_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_url_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def route_policy(view_func, names):
+    modulename = view_func.__module__
+    return RoutePolicy(
+        admin=modulename != 'voting.views' or bool(names & ADMIN_VOTING_VIEWS),
+        voter=modulename != 'administrator.views',
+        guest=bool(names & GUEST_VIEWS) or modulename in ('django.contrib.auth.views', 'voting.views'),
+    )
+
+
+def build_route_table(urlconf=None):
+    """Map every routed view function to its RoutePolicy"""
+    names = {}
+    for pattern in iter_url_patterns(get_resolver(urlconf).url_patterns):
+        names.setdefault(pattern.callback, set())
+        if pattern.name:
+            names[pattern.callback].add(pattern.name)
+    return {view_func: route_policy(view_func, view_names) for view_func, view_names in names.items()}
+
 
 class AccountCheckMiddleWare(MiddlewareMixin):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.routes = None
+        self.redirects = None
+
+    def load_routes(self):
+        # Resolved on the first request rather than in __init__, once the
+        # URLconf can be imported without cycles
+        self.routes = build_route_table()
+        self.redirects = {
+            'admin': reverse('adminDashboard'),
+            'voter': reverse('voterDashboard'),
+            'guest': reverse('voter_login'),
+        }
+
     def process_view(self, request, view_func, view_args, view_kwargs):
-        modulename = view_func.__module__
+        if self.routes is None:
+            self.load_routes()
+        policy = self.routes.get(view_func)
+        if policy is None:
+            # A view reached outside the URLconf, e.g. a custom error handler
+            policy = self.routes[view_func] = route_policy(view_func, set())
         user = request.user
-        voter_id = request.session.get('voter_id')
 
         if user.is_authenticated:
-            if user.user_type == '1':  # Admin
-                if modulename == 'voting.views':
-                    if request.path == reverse('fetch_ballot'):
-                        pass
-                    elif request.path == reverse('index'):
-                        pass
-                    else:
-                        messages.error(request, "You do not have access to this resource")
-                        return redirect(reverse('adminDashboard'))
-            else:
-                 # Should not happen ideally
-                 pass
-
-        elif voter_id:
+            if user.user_type == '1' and not policy.admin:  # Admin
+                messages.error(request, "You do not have access to this resource")
+                return redirect(self.redirects['admin'])
+
+        elif request.session.get('voter_id'):
             # Voter
-            if modulename == 'administrator.views':
+            if not policy.voter:
                 messages.error(request, "You do not have access to this resource")
-                return redirect(reverse('voterDashboard'))
-        
-        else:
+                return redirect(self.redirects['voter'])
+
+        elif not policy.guest:
             # Guest
-            if request.path == reverse('account_login') or request.path == reverse('voter_login') or modulename == 'django.contrib.auth.views' or modulename == 'voting.views':
-                pass
-            else:
-                return redirect(reverse('voter_login'))
+            return redirect(self.redirects['guest'])
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, database time, query counts and response size per URL name
+
+    Enabled by the REQUEST_METRICS setting. When it is off Django drops the
+    middleware from the chain at startup, so it costs nothing per request.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall = time.perf_counter() - start
+
+        match = request.resolver_match
+        metrics.record({
+            'view': match.view_name if match else '<unresolved>',
+            'method': request.method,
+            'status': response.status_code,
+            'wall_ms': round(wall * 1000, 3),
+            'db_ms': round(recorder.time * 1000, 3),
+            'queries': recorder.count,
+            'duplicate_queries': recorder.duplicates,
+            # Streamed bodies are produced after this returns
+            'response_bytes': None if response.streaming else len(response.content),
+        })
+        return response
@@ -1,3 +1,68 @@
-from django.test import TestCase
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from account.metrics import metrics
+from account.middleware import build_route_table
+from account.models import CustomUser
+from voting import views as voting_views
+from administrator import views as admin_views
 
 # Create your tests here.
+
+
+class AccountCheckMiddleWareTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email="admin@test.com", password="password", user_type='1')
+
+    def test_route_table_policies(self):
+        routes = build_route_table()
+        self.assertTrue(routes[voting_views.fetch_ballot].admin)
+        self.assertFalse(routes[voting_views.show_ballot].admin)
+        self.assertFalse(routes[admin_views.voters].voter)
+        self.assertFalse(routes[admin_views.voters].guest)
+        self.assertTrue(routes[voting_views.show_ballot].guest)
+
+    def test_admin_is_kept_out_of_voter_pages(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('voterDashboard'))
+        self.assertRedirects(response, reverse('adminDashboard'), fetch_redirect_response=False)
+
+    def test_voter_is_kept_out_of_admin_pages(self):
+        session = self.client.session
+        session['voter_id'] = 1
+        session.save()
+        response = self.client.get(reverse('viewVotes'))
+        self.assertRedirects(response, reverse('voterDashboard'), fetch_redirect_response=False)
+
+    def test_guest_is_sent_to_login(self):
+        response = self.client.get(reverse('viewVotes'))
+        self.assertRedirects(response, reverse('voter_login'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('account_login')).status_code, 200)
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.clear()
+        self.admin = CustomUser.objects.create_user(email="admin@test.com", password="password", user_type='1')
+        self.client.force_login(self.admin)
+
+    def test_disabled_by_default(self):
+        self.client.get(reverse('adminDashboard'))
+        self.assertEqual(metrics.snapshot(), {})
+
+    @override_settings(REQUEST_METRICS=True)
+    def test_records_requests_by_url_name(self):
+        client = Client()
+        client.force_login(self.admin)
+        with self.assertLogs('e_voting.requests', 'INFO') as logs:
+            client.get(reverse('adminDashboard'))
+            stats = client.get(reverse('requestStats')).json()
+            client.post(reverse('requestStats'))
+        self.assertIn('"view": "adminDashboard"', logs.output[0])
+        self.assertEqual(len(logs.output), 3)
+
+        self.assertTrue(stats['enabled'])
+        dashboard = stats['views']['adminDashboard']
+        self.assertEqual(dashboard['requests'], 1)
+        self.assertGreater(dashboard['avg_queries'], 0)
+        self.assertGreater(dashboard['avg_response_bytes'], 0)
+        self.assertEqual(list(metrics.snapshot()), ['requestStats'])
@@ -0,0 +1,66 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .models import BackgroundJob
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_JOB_WORKERS', 2),
+            thread_name_prefix='background-job',
+        )
+    return _executor
+
+
+def run_job(job_id, func, args):
+    """Run ``func(job, *args)`` and record the outcome on the job row"""
+    close_old_connections()
+    try:
+        job = BackgroundJob.objects.get(id=job_id)
+        job.status = BackgroundJob.RUNNING
+        job.save(update_fields=['status', 'updated_at'])
+        func(job, *args)
+        job.status = BackgroundJob.DONE
+        job.progress = 100
+        job.save()
+    except Exception:
+        BackgroundJob.objects.filter(id=job_id).update(
+            status=BackgroundJob.FAILED, error=traceback.format_exc())
+
+
+def fail_stale_jobs(**filters):
+    """Mark pending or running jobs that stopped making progress as failed
+
+    Jobs live in this process's thread pool, so a restart or deploy loses
+    them mid-run and their rows would otherwise stay pending forever.
+    Running jobs touch updated_at whenever they report progress.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'BACKGROUND_JOB_STALE_AFTER', 15 * 60))
+    return BackgroundJob.objects.filter(
+        status__in=[BackgroundJob.PENDING, BackgroundJob.RUNNING], updated_at__lt=cutoff, **filters
+    ).update(status=BackgroundJob.FAILED, error="Lost: no progress reported, the worker probably restarted")
+
+
+def submit_job(job, func, *args):
+    """Queue a job on the in-process worker pool once the current transaction commits"""
+    if getattr(settings, 'BACKGROUND_JOBS_EAGER', False):
+        run_job(job.id, func, args)
+        job.refresh_from_db()
+        return job
+
+    def work():
+        try:
+            run_job(job.id, func, args)
+        finally:
+            # Worker threads own their connection; don't leave it open
+            connection.close()
+
+    transaction.on_commit(lambda: get_executor().submit(work))
+    return job
@@ -0,0 +1,30 @@
+from voting.vote_reset import reset_votes
+from .jobs import fail_stale_jobs, submit_job
+from .models import BackgroundJob
+
+
+def reset_election_votes(job, election_id):
+    def progress(deleted, total):
+        # The last percent is left for the final sweep and tally rebuild
+        job.set_progress(min(99, deleted * 100 // total) if total else 99)
+
+    reset_votes(election_id, progress=progress)
+
+
+def start_vote_reset(election_id):
+    """Return the running vote reset of an election, queueing one if none is running
+
+    A reset lost to a restart counts as failed and a new one is queued.
+    Every run starts over from what is left: it deletes the remaining
+    votes, then clears the voted flags and rebuilds the tallies.
+    """
+    fail_stale_jobs(kind=BackgroundJob.RESET_VOTES, election_id=election_id)
+    job = BackgroundJob.objects.filter(
+        kind=BackgroundJob.RESET_VOTES, election_id=election_id,
+        status__in=[BackgroundJob.PENDING, BackgroundJob.RUNNING],
+    ).order_by('-id').first()
+    if job:
+        return job
+    BackgroundJob.objects.filter(kind=BackgroundJob.RESET_VOTES, election_id=election_id).delete()
+    job = BackgroundJob.objects.create(kind=BackgroundJob.RESET_VOTES, election_id=election_id)
+    return submit_job(job, reset_election_votes, election_id)
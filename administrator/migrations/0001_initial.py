@@ -0,0 +1,34 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('voting', '0006_candidatetally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('results_pdf', 'Results PDF')], max_length=30)),
+                ('key', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.BinaryField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['election', 'kind', 'key'], name='administrat_electio_7ebfae_idx')],
+            },
+        ),
+    ]
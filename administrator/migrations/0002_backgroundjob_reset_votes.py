@@ -0,0 +1,18 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('results_pdf', 'Results PDF'), ('reset_votes', 'Vote reset')], max_length=30),
+        ),
+    ]
@@ -1,3 +1,40 @@
 from django.db import models
+from django.utils import timezone
+from voting.models import Election
 
 # Create your models here.
+
+
+class BackgroundJob(models.Model):
+    RESULTS_PDF = 'results_pdf'
+    RESET_VOTES = 'reset_votes'
+    KIND = ((RESULTS_PDF, "Results PDF"), (RESET_VOTES, "Vote reset"))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS = ((PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed"))
+
+    kind = models.CharField(max_length=30, choices=KIND)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    # Identifies the input the job ran against, e.g. the results version a
+    # PDF was rendered from, so a finished job can be reused as a cache entry
+    key = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    result = models.BinaryField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['election', 'kind', 'key'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+    def set_progress(self, progress):
+        # updated_at doubles as a heartbeat, see jobs.fail_stale_jobs
+        self.progress = progress
+        BackgroundJob.objects.filter(id=self.id).update(progress=progress, updated_at=timezone.now())
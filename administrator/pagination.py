@@ -0,0 +1,106 @@
+import base64
+import json
+from collections import namedtuple
+from django.db import connections
+
+# Row counts past this many are not counted exactly
+APPROXIMATE_COUNT_LIMIT = 10000
+
+# value: number of rows; exact is False when value is an estimate or a floor
+RowCount = namedtuple('RowCount', ['value', 'exact'])
+
+
+def encode_token(direction, pivot):
+    data = json.dumps([direction, pivot]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_token(token):
+    # Anything that doesn't decode to a cursor falls back to the first page
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pivot = json.loads(data)
+    except (ValueError, TypeError):
+        return None, None
+    if direction not in ('next', 'prev') or not isinstance(pivot, int):
+        return None, None
+    return direction, pivot
+
+
+def planner_estimate(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_token, prev_token):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.prev_token = prev_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_token is not None
+
+
+class KeysetPaginator:
+    """Pages through a queryset by ``id`` with opaque cursors
+
+    Each page is one range scan on the primary key, so a page deep into a
+    large table costs the same as the first one; there is no OFFSET.
+    """
+
+    def __init__(self, queryset, per_page=50):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def approximate_count(self, limit=APPROXIMATE_COUNT_LIMIT):
+        """Count rows without scanning more than ``limit`` + 1 of them
+
+        Past the limit PostgreSQL reports the planner's estimate; other
+        backends report the limit as a floor.
+        """
+        queryset = self.queryset.order_by()
+        counted = queryset[:limit + 1].count()
+        if counted <= limit:
+            return RowCount(counted, True)
+        estimate = planner_estimate(queryset)
+        return RowCount(max(estimate or 0, limit), False)
+
+    def get_page(self, token=None):
+        direction, pivot = decode_token(token) if token else (None, None)
+        if direction == 'prev':
+            rows = list(self.queryset.filter(id__lt=pivot).order_by('-id')[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, more
+        else:
+            queryset = self.queryset.order_by('id')
+            if direction == 'next':
+                queryset = queryset.filter(id__gt=pivot)
+            rows = list(queryset[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = more, direction == 'next'
+
+        next_token = encode_token('next', rows[-1].id) if rows and has_next else None
+        prev_token = encode_token('prev', rows[0].id) if rows and has_previous else None
+        return KeysetPage(rows, next_token, prev_token)
@@ -0,0 +1,83 @@
+from io import BytesIO
+from django_renderpdf.helpers import render_pdf
+from voting.models import Election
+from voting.results import election_results, results_version
+from .jobs import fail_stale_jobs, submit_job
+from .models import BackgroundJob
+
+REPORT_TEMPLATE = 'admin/print.html'
+
+
+def tabulation_rounds(result):
+    """Rounds of a ranked position's count, with candidate names and votes rounded for print"""
+    names = {candidate.id: candidate.name for candidate in result.candidates}
+    return [
+        {
+            'number': count.number,
+            'totals': [(names[c], round(votes, 2)) for c, votes in count.totals],
+            'elected': [names[c] for c in count.elected],
+            'eliminated': names.get(count.eliminated),
+            'transfers': [(names[c], round(votes, 2)) for c, votes in count.transfers.items()],
+            'exhausted': round(count.exhausted, 2),
+            'tied_with': [names[c] for c in count.tied if c != count.eliminated],
+        }
+        for count in result.tabulation.rounds
+    ]
+
+
+def report_context(election_id, source='tally'):
+    """Template context of the results report for an election"""
+    title = "E-voting"
+    position_data = {}
+    election = Election.objects.filter(id=election_id).first()
+    if election:
+        title = election.title
+        for result in election_results(election_id, source):
+            position = result.position
+            candidate_data = [
+                {'name': candidate.name, 'votes': candidate.votes}
+                for candidate in result.candidates
+            ]
+            position_data[position.name] = {
+                'candidate_data': candidate_data,
+                'total_votes': result.total_votes,
+                'winners': result.winners,
+                'tied': result.tied,
+                'seats_left': result.selection.seats_left,
+                'max_vote': position.max_vote}
+            if result.tabulation is not None:
+                position_data[position.name].update({
+                    'quota': result.tabulation.quota,
+                    'rounds': tabulation_rounds(result),
+                })
+    return {'positions': position_data, 'election_title': title}
+
+
+def build_results_pdf(job, election_id, source='tally'):
+    context = report_context(election_id, source)
+    job.set_progress(50)
+    buffer = BytesIO()
+    render_pdf(REPORT_TEMPLATE, buffer, context=context)
+    job.result = buffer.getvalue()
+
+
+def results_report(election_id, source='tally'):
+    """Return the report job for the current results, queueing one if none exists
+
+    Every source yields the same counts, so a finished report is reused
+    whichever source rendered it.
+    """
+    version = results_version(election_id)
+    fail_stale_jobs(kind=BackgroundJob.RESULTS_PDF, election_id=election_id)
+    job = BackgroundJob.objects.filter(
+        kind=BackgroundJob.RESULTS_PDF, election_id=election_id, key=version
+    ).exclude(status=BackgroundJob.FAILED).defer('result').order_by('-id').first()
+    if job:
+        return job
+    # Reports for older results can never be served again
+    BackgroundJob.objects.filter(
+        kind=BackgroundJob.RESULTS_PDF, election_id=election_id
+    ).exclude(status__in=[BackgroundJob.PENDING, BackgroundJob.RUNNING]).delete()
+    job = BackgroundJob.objects.create(
+        kind=BackgroundJob.RESULTS_PDF, election_id=election_id, key=version)
+    return submit_job(job, build_results_pdf, election_id, source)
@@ -1,3 +1,350 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from voting.models import Election, Position, Candidate, Voter, Votes, CandidateTally
+from voting.tallies import record_votes, tally_counts
+from voting.results import results_version
+from voting.vote_reset import reset_votes
+from voting.testing import QueryBudgetMixin, grow_ballot
+from administrator.models import BackgroundJob
+from administrator.pagination import KeysetPaginator
+from account.models import CustomUser
 
 # Create your tests here.
+
+
+class AdminElectionTestCase(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email="admin@test.com", password="password", user_type='1')
+        self.election = Election.objects.create(title="Test Election", created_by=self.admin)
+        self.position = Position.objects.create(election=self.election, name="President", max_vote=1, priority=1)
+        self.candidates = [
+            Candidate.objects.create(fullname=f"Candidate {i}", position=self.position, bio="Bio")
+            for i in range(2)
+        ]
+        self.client.force_login(self.admin)
+        session = self.client.session
+        session['admin_election_id'] = self.election.id
+        session.save()
+
+    def cast(self, sin, candidate):
+        voter = Voter.objects.create(sin=sin, election=self.election, voted=True)
+        vote = Votes.objects.create(election=self.election, voter=voter, position=self.position, candidate=candidate)
+        record_votes([vote])
+        return voter
+
+
+class TallyMaintenanceTests(AdminElectionTestCase):
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_reset_zeroes_tallies(self):
+        self.cast("1", self.candidates[0])
+        response = self.client.get(reverse('resetVote'))
+        self.assertRedirects(response, reverse('viewVotes'))
+        self.assertFalse(Votes.objects.exists())
+        self.assertFalse(Voter.objects.filter(voted=True).exists())
+        self.assertEqual(set(tally_counts(self.election.id).values()), {0})
+        self.assertEqual(BackgroundJob.objects.get().status, BackgroundJob.DONE)
+
+    def test_reset_is_queued_in_background(self):
+        self.cast("1", self.candidates[0])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(reverse('resetVote'))
+        self.assertTemplateUsed(response, "admin/reset_status.html")
+        self.assertEqual(len(callbacks), 1)
+        job = BackgroundJob.objects.get(kind=BackgroundJob.RESET_VOTES)
+        # A second click follows the running reset instead of starting another
+        self.client.get(reverse('resetVote'))
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        status = self.client.get(reverse('resetVoteStatus', args=[job.id])).json()
+        self.assertEqual((status['code'], status['status']), (200, BackgroundJob.PENDING))
+        self.assertEqual(self.client.get(reverse('printResultStatus', args=[job.id])).json()['code'], 404)
+
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_lost_reset_is_rerun_to_the_end(self):
+        # A reset that died after its batches, before the final sweep
+        self.cast("1", self.candidates[0])
+        voter = self.cast("2", self.candidates[1])
+        Votes.objects.filter(voter=voter).delete()
+        lost = BackgroundJob.objects.create(
+            kind=BackgroundJob.RESET_VOTES, election=self.election, status=BackgroundJob.RUNNING)
+        BackgroundJob.objects.filter(id=lost.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.client.get(reverse('resetVote'))
+        job = BackgroundJob.objects.get(kind=BackgroundJob.RESET_VOTES)
+        self.assertNotEqual(job.id, lost.id)
+        self.assertEqual(job.status, BackgroundJob.DONE)
+        self.assertFalse(Votes.objects.exists())
+        self.assertFalse(Voter.objects.filter(voted=True).exists())
+        self.assertEqual(set(tally_counts(self.election.id).values()), {0})
+
+    def test_reset_deletes_in_batches(self):
+        for i in range(5):
+            self.cast(str(i), self.candidates[i % 2])
+        other = Election.objects.create(title="Other Election", created_by=self.admin)
+        other_position = Position.objects.create(election=other, name="President", max_vote=1, priority=1)
+        other_candidate = Candidate.objects.create(fullname="Other", position=other_position, bio="Bio")
+        other_voter = Voter.objects.create(sin="1", election=other, voted=True)
+        Votes.objects.create(voter=other_voter, position=other_position, candidate=other_candidate)
+
+        reports = []
+        deleted = reset_votes(self.election.id, batch_size=2, progress=lambda *p: reports.append(p))
+        self.assertEqual(deleted, 5)
+        self.assertEqual(reports, [(2, 5), (4, 5), (5, 5)])
+        self.assertFalse(Votes.objects.filter(election=self.election).exists())
+        self.assertEqual(Votes.objects.filter(election=other).count(), 1)
+        self.assertTrue(Voter.objects.get(id=other_voter.id).voted)
+
+    def test_deleting_voter_retracts_votes(self):
+        voter = self.cast("1", self.candidates[0])
+        self.cast("2", self.candidates[0])
+        self.client.post(reverse('deleteVoter'), {'id': voter.id})
+        self.assertEqual(tally_counts(self.election.id), {self.candidates[0].id: 1})
+
+    def test_dashboard_reads_tallies(self):
+        self.cast("1", self.candidates[1])
+        response = self.client.get(reverse('adminDashboard'))
+        self.assertEqual(response.status_code, 200)
+        chart = response.context['chart_data'][self.position]
+        self.assertEqual(chart['votes'], [0, 1])
+
+    def test_dashboard_result_source(self):
+        self.cast("1", self.candidates[1])
+        CandidateTally.objects.update(count=7)
+        response = self.client.get(reverse('adminDashboard'), {'source': 'votes'})
+        self.assertEqual(response.context['results_source'], 'votes')
+        self.assertEqual(response.context['chart_data'][self.position]['votes'], [0, 1])
+        response = self.client.get(reverse('adminDashboard'), {'source': 'bogus'})
+        self.assertEqual(response.context['results_source'], 'tally')
+
+
+class PrintViewTests(AdminElectionTestCase):
+    def test_print_reports_tie(self):
+        self.cast("1", self.candidates[0])
+        self.cast("2", self.candidates[1])
+        response = self.client.get(reverse('printResult'), {'html': 'true'})
+        self.assertEqual(response.status_code, 200)
+        value = response.context['positions']['President']
+        self.assertEqual(value['winners'], [])
+        self.assertEqual(len(value['tied']), 2)
+
+    def test_print_shows_ranked_rounds(self):
+        self.position.voting_method = Position.RANKED
+        self.position.save()
+        third = Candidate.objects.create(fullname="Candidate 2", position=self.position, bio="Bio")
+        for sin, ranking in [("1", [0]), ("2", [0]), ("3", [1, 2]), ("4", [2, 1]), ("5", [2, 1])]:
+            voter = Voter.objects.create(sin=sin, election=self.election, voted=True)
+            record_votes(Votes.objects.bulk_create([
+                Votes(election=self.election, voter=voter, position=self.position,
+                      candidate=(self.candidates + [third])[i], rank=rank)
+                for rank, i in enumerate(ranking, start=1)
+            ]))
+        response = self.client.get(reverse('printResult'), {'html': 'true'})
+        value = response.context['positions']['President']
+        self.assertEqual([w.name for w in value['winners']], ["Candidate 2"])
+        self.assertEqual(value['rounds'][0]['eliminated'], "Candidate 1")
+        self.assertEqual(value['rounds'][0]['transfers'], [("Candidate 2", 1.0)])
+        self.assertContains(response, "Count by round")
+
+    def test_print_shows_ballot_order_ties(self):
+        self.position.voting_method = Position.RANKED
+        self.position.save()
+        self.cast("1", self.candidates[0])
+        self.cast("2", self.candidates[1])
+        response = self.client.get(reverse('printResult'), {'html': 'true'})
+        value = response.context['positions']['President']
+        self.assertEqual(value['rounds'][0]['tied_with'], ["Candidate 0"])
+        self.assertContains(response, "Ties settled by ballot order: Candidate 0, Candidate 1")
+
+    def test_report_is_queued_in_background(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(reverse('printResult'))
+        self.assertTemplateUsed(response, "admin/print_status.html")
+        self.assertEqual(len(callbacks), 1)
+        job = BackgroundJob.objects.get()
+        status = self.client.get(reverse('printResultStatus', args=[job.id])).json()
+        self.assertEqual((status['code'], status['status']), (200, BackgroundJob.PENDING))
+
+    def test_lost_report_job_is_replaced(self):
+        lost = BackgroundJob.objects.create(
+            kind=BackgroundJob.RESULTS_PDF, election=self.election, key=results_version(self.election.id),
+            status=BackgroundJob.RUNNING)
+        BackgroundJob.objects.filter(id=lost.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        status = self.client.get(reverse('printResultStatus', args=[lost.id])).json()
+        self.assertEqual(status['status'], BackgroundJob.FAILED)
+        with self.captureOnCommitCallbacks():
+            self.client.get(reverse('printResult'))
+        self.assertEqual(BackgroundJob.objects.exclude(id=lost.id).get().status, BackgroundJob.PENDING)
+
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_report_is_cached_per_results_version(self):
+        response = self.client.get(reverse('printResult'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b"".join(response.streaming_content))
+        self.client.get(reverse('printResult'))
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+        self.cast("1", self.candidates[0])
+        self.client.get(reverse('printResult'))
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, BackgroundJob.DONE)
+        self.assertEqual(job.key, results_version(self.election.id))
+
+
+    def test_revote_with_other_later_preferences_moves_version(self):
+        def vote(*ranking):
+            voter = Voter.objects.create(sin="1", election=self.election, voted=True)
+            record_votes(Votes.objects.bulk_create([
+                Votes(election=self.election, voter=voter, position=self.position, candidate=candidate, rank=rank)
+                for rank, candidate in enumerate(ranking, start=1)
+            ]))
+
+        vote(self.candidates[0], self.candidates[1])
+        version = results_version(self.election.id)
+        reset_votes(self.election.id)
+        Voter.objects.all().delete()
+        # Same first preference, so the tallies match the first count
+        vote(self.candidates[0])
+        self.assertNotEqual(results_version(self.election.id), version)
+
+
+class ElectionTitleTests(AdminElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_ballot_title_updates_rendered_title(self):
+        url = reverse('show_ballot', args=[self.election.id])
+        self.assertContains(Client().get(url), "<b>Test Election</b>")
+        self.client.post(reverse('ballot_title'), {'title': "Renamed Election"},
+                         HTTP_REFERER="http://testserver" + reverse('adminDashboard'))
+        self.assertContains(Client().get(url), "<b>Renamed Election</b>")
+
+    def test_title_is_memoized(self):
+        from voting.context_processors import get_election_title
+        self.assertEqual(get_election_title(self.election.id), "Test Election")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_election_title(self.election.id), "Test Election")
+
+
+class PositionMethodTests(AdminElectionTestCase):
+    def update(self, name, voting_method):
+        return self.client.post(reverse('updatePosition'), {
+            'id': self.position.id, 'name': name, 'max_vote': 1, 'voting_method': voting_method}, follow=True)
+
+    def test_method_is_locked_once_votes_are_cast(self):
+        self.update("President", Position.RANKED)
+        self.update("President", Position.PLURALITY)
+        self.cast("1", self.candidates[0])
+        response = self.update("President", Position.RANKED)
+        self.assertContains(response, "The voting method cannot change once votes have been cast")
+        self.assertEqual(Position.objects.get().voting_method, Position.PLURALITY)
+        # Other edits still go through
+        self.update("Chair", Position.PLURALITY)
+        self.assertEqual(Position.objects.get().name, "Chair")
+
+
+class ImportVotersTests(AdminElectionTestCase):
+    def test_import_skips_duplicates_and_registered(self):
+        Voter.objects.create(sin="100", election=self.election)
+        upload = SimpleUploadedFile("roll.csv", b"sin\n100\n101\n102\n101\n\n103\n")
+        response = self.client.post(reverse('importVoters'), {'voters_file': upload}, follow=True)
+        self.assertContains(response, "5 rows: 3 added, 1 already registered, 1 duplicates")
+        self.assertEqual(
+            sorted(Voter.objects.filter(election=self.election).values_list('sin', flat=True)),
+            ["100", "101", "102", "103"])
+
+
+class VoteExportTests(AdminElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.cast(f"sin-{i}", self.candidates[i % 2])
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('exportVotes'), {'format': 'csv'})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "vote_id,sin,position,candidate,rank")
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].endswith(",sin-0,President,Candidate 0,1"))
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('exportVoters'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertIn('"sin": "sin-0"', lines[0])
+
+    def test_votes_page_walks_cursor(self):
+        paginator = KeysetPaginator(Votes.objects.all(), per_page=2)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_token)
+        last = paginator.get_page(second.next_token)
+        self.assertEqual(len(last), 1)
+        self.assertFalse(last.has_next)
+        back = paginator.get_page(last.prev_token)
+        self.assertEqual([v.id for v in back], [v.id for v in second])
+        self.assertFalse(paginator.get_page(back.prev_token).has_previous)
+
+        response = self.client.get(reverse('viewVotes'), {'cursor': first.next_token})
+        self.assertEqual(len(response.context['votes']), 3)
+
+
+class AdminListPaginationTests(AdminElectionTestCase):
+    def test_voters_page_walks_cursor(self):
+        Voter.objects.bulk_create(Voter(sin=f"sin-{i}", election=self.election) for i in range(60))
+        response = self.client.get(reverse('adminViewVoters'))
+        first = response.context['voters']
+        self.assertEqual(len(first), 50)
+        self.assertEqual(response.context['voter_count'], (60, True))
+        response = self.client.get(reverse('adminViewVoters'), {'cursor': first.next_token})
+        self.assertEqual(len(response.context['voters']), 10)
+        self.assertFalse(response.context['voters'].has_next)
+
+    def test_candidates_page(self):
+        response = self.client.get(reverse('viewCandidates'))
+        self.assertEqual([c.id for c in response.context['candidates']], [c.id for c in self.candidates])
+        self.assertEqual(response.context['candidate_count'], (2, True))
+
+    def test_approximate_count_stops_at_limit(self):
+        paginator = KeysetPaginator(Candidate.objects.all())
+        self.assertEqual(paginator.approximate_count(limit=1), (1, False))
+        self.assertEqual(paginator.approximate_count(limit=2), (2, True))
+
+
+class AdminQueryBudgetTests(QueryBudgetMixin, AdminElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cast("1", self.candidates[0])
+
+    def grow(self):
+        grow_ballot(self.election, positions=4, candidates=5, voters=10)
+
+    def assertPageBudget(self, budget, name, data=None):
+        self.assertQueryBudget(budget, lambda: self.client.get(reverse(name), data), self.grow)
+
+    def test_dashboard(self):
+        self.assertPageBudget(8, 'adminDashboard')
+
+    def test_print_preview(self):
+        self.assertPageBudget(6, 'printResult', {'html': 'true'})
+
+    def test_votes(self):
+        self.assertPageBudget(4, 'viewVotes')
+
+    def test_voters(self):
+        self.assertPageBudget(4, 'adminViewVoters')
+
+    def test_candidates(self):
+        self.assertPageBudget(5, 'viewCandidates')
+
+    def test_positions(self):
+        self.assertPageBudget(3, 'viewPositions')
+
+    def test_ballot_preview(self):
+        self.assertPageBudget(5, 'fetch_ballot')
+
+    def test_ballot_position(self):
+        self.assertPageBudget(2, 'ballot_position')
@@ -10,8 +10,11 @@ urlpatterns = [
     path('election/toggle_status', views.toggle_election_status, name='toggle_election_status'),
     path('admins', views.viewAdmins, name='viewAdmins'),
     path('admins/delete', views.deleteAdmin, name='deleteAdmin'),
+    path('stats/requests/', views.requestStats, name='requestStats'),
     # * Voters
     path('voters', views.voters, name="adminViewVoters"),
+    path('voters/import', views.importVoters, name="importVoters"),
+    path('voters/export', views.exportVoters, name="exportVoters"),
     path('voters/view', views.view_voter_by_id, name="viewVoter"),
     path('voters/delete', views.deleteVoter, name='deleteVoter'),
     path('voters/update', views.updateVoter, name="updateVoter"),
@@ -37,7 +40,10 @@ urlpatterns = [
     # * Votes
     path('votes/view', views.viewVotes, name='viewVotes'),
     path('votes/reset/', views.resetVote, name='resetVote'),
+    path('votes/reset/status/<int:job_id>/', views.reset_status, name='resetVoteStatus'),
+    path('votes/export/', views.exportVotes, name='exportVotes'),
     path('votes/print/', views.PrintView.as_view(), name='printResult'),
+    path('votes/print/status/<int:job_id>/', views.print_status, name='printResultStatus'),
 
 
 
@@ -1,14 +1,27 @@
 from django.shortcuts import render, reverse, redirect
-from django.core.paginator import Paginator
-from voting.models import Voter, Position, Candidate, Votes, Election
+from voting.models import Voter, Position, Candidate, Votes, Election, renumber_positions
+from voting.results import RESULT_SOURCES, election_results, results_source
+from voting.tallies import retract_votes
+from voting.voter_import import import_voters
+from voting.context_processors import forget_election_title
 from account.models import CustomUser
+from account.metrics import metrics
 from voting.forms import *
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.db import transaction
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django_renderpdf.views import PDFView
+import csv
+from io import BytesIO, TextIOWrapper
+from .models import BackgroundJob
+from .reports import report_context, results_report
+from .maintenance import start_vote_reset
+from .jobs import fail_stale_jobs
+from .exports import EXPORT_FORMATS, stream_export
+from .pagination import KeysetPaginator
 
 @login_required
 def dashboard(request):
@@ -35,32 +48,28 @@ def dashboard(request):
             del request.session['admin_election_id']
             return redirect(reverse('adminDashboard'))
 
-        positions = Position.objects.filter(election_id=election_id).order_by('priority')
-        candidates = Candidate.objects.filter(position__election_id=election_id)
+        source = results_source(request.GET.get('source'))
+        results = election_results(election_id, source)
         voters = Voter.objects.filter(election_id=election_id)
         voted_voters = voters.filter(voted=True)
         
         chart_data = {}
-        for position in positions:
-            list_of_candidates = []
-            votes_count = []
-            for candidate in candidates.filter(position=position):
-                list_of_candidates.append(candidate.fullname)
-                votes = Votes.objects.filter(candidate=candidate).count()
-                votes_count.append(votes)
-            chart_data[position] = {
-                'candidates': list_of_candidates,
-                'votes': votes_count,
-                'pos_id': position.id
+        for result in results:
+            chart_data[result.position] = {
+                'candidates': [candidate.name for candidate in result.candidates],
+                'votes': [candidate.votes for candidate in result.candidates],
+                'pos_id': result.position.id
             }
 
         context = {
-            'position_count': positions.count(),
-            'candidate_count': candidates.count(),
+            'position_count': len(results),
+            'candidate_count': sum(len(result.candidates) for result in results),
             'voters_count': voters.count(),
             'voted_voters_count': voted_voters.count(),
-            'positions': positions,
+            'positions': [result.position for result in results],
             'chart_data': chart_data,
+            'results_source': source,
+            'results_sources': list(RESULT_SOURCES),
             'page_title': "Dashboard",
             'election': election
         }
@@ -75,16 +84,12 @@ def voters(request):
         messages.error(request, "Please select an election first")
         return redirect(reverse('adminDashboard'))
         
-    # 1. Fetch the queryset (Still lazy here)
-    voter_list = Voter.objects.filter(election_id=election_id).order_by('id')
-    
-    # 2. Setup Pagination (50 voters per page)
-    paginator = Paginator(voter_list, 50) 
-    page_number = request.GET.get('page')
-    voters = paginator.get_page(page_number)
+    # 50 voters per page, walked by cursor rather than page number
+    paginator = KeysetPaginator(Voter.objects.filter(election_id=election_id), 50)
 
     context = {
-        'voters': voters, # Now only 50 objects at a time
+        'voters': paginator.get_page(request.GET.get('cursor')),
+        'voter_count': paginator.approximate_count(),
         'page_title': 'Voters List'
     }
     if request.method == 'POST':
@@ -102,6 +107,31 @@ def voters(request):
 
     return render(request, "admin/voters.html", context)
 
+@login_required
+@require_POST
+def importVoters(request):
+    election_id = request.session.get('admin_election_id')
+    if not election_id:
+        messages.error(request, "Please select an election first")
+        return redirect(reverse('adminDashboard'))
+
+    upload = request.FILES.get('voters_file')
+    if not upload:
+        messages.error(request, "Please choose a CSV file")
+        return redirect(reverse('adminViewVoters'))
+
+    # Read the upload line by line; large files are spooled to disk by Django
+    election = Election.objects.get(id=election_id)
+    lines = TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        stats = import_voters(election, lines)
+    except (UnicodeDecodeError, csv.Error):
+        messages.error(request, "The file is not a valid CSV file")
+    else:
+        messages.success(request, f"Voter roll imported: {stats}")
+    return redirect(reverse('adminViewVoters'))
+
+
 @login_required
 def view_voter_by_id(request):
     voter_id = request.GET.get('id', None)
@@ -142,7 +172,10 @@ def deleteVoter(request):
         messages.error(request, "Access Denied")
     try:
         voter = Voter.objects.get(id=request.POST.get('id'))
-        voter.delete()
+        with transaction.atomic():
+            if voter.voted:
+                retract_votes(voter)
+            voter.delete()
         messages.success(request, "Voter Has Been Deleted")
     except:
         messages.error(request, "Access To This Resource Denied")
@@ -169,6 +202,7 @@ def viewPositions(request):
             form.election_id = election_id
             form.priority = positions.count() + 1
             form.save()
+            renumber_positions(election_id)
             messages.success(request, "New Position Created")
         else:
             messages.error(request, "Form errors")
@@ -187,6 +221,7 @@ def view_position_by_id(request):
         pos = pos[0]
         context['name'] = pos.name
         context['max_vote'] = pos.max_vote
+        context['voting_method'] = pos.voting_method
         context['id'] = pos.id
     return JsonResponse(context)
 
@@ -199,8 +234,11 @@ def updatePosition(request):
         instance = Position.objects.get(id=request.POST.get('id'))
         pos = PositionForm(request.POST or None, instance=instance)
         # Note: PositionForm needs to allow existing election linkage
-        pos.save()
-        messages.success(request, "Position has been updated")
+        if pos.is_valid():
+            pos.save()
+            messages.success(request, "Position has been updated")
+        else:
+            messages.error(request, " ".join(error for errors in pos.errors.values() for error in errors))
     except:
         messages.error(request, "Access To This Resource Denied")
 
@@ -214,6 +252,7 @@ def deletePosition(request):
     try:
         pos = Position.objects.get(id=request.POST.get('id'))
         pos.delete()
+        renumber_positions(pos.election_id)
         messages.success(request, "Position Has Been Deleted")
     except:
         messages.error(request, "Access To This Resource Denied")
@@ -227,21 +266,23 @@ def viewCandidates(request):
     if not election_id:
         return redirect(reverse('adminDashboard'))
         
-    candidates = Candidate.objects.filter(position__election_id=election_id)
+    candidates = Candidate.objects.filter(position__election_id=election_id).select_related('position__election')
+    paginator = KeysetPaginator(candidates, 50)
     form = CandidateForm(request.POST or None, request.FILES or None)
     
     # Filter position dropdown
     if request.method != 'POST':
-        form.fields['position'].queryset = Position.objects.filter(election_id=election_id)
+        form.fields['position'].queryset = Position.objects.filter(election_id=election_id).select_related('election')
 
     context = {
-        'candidates': candidates,
+        'candidates': paginator.get_page(request.GET.get('cursor')),
+        'candidate_count': paginator.approximate_count(),
         'form1': form,
         'page_title': 'Candidates'
     }
     if request.method == 'POST':
         # Need to re-filter queryset for validation to work if user submits
-        form.fields['position'].queryset = Position.objects.filter(election_id=election_id)
+        form.fields['position'].queryset = Position.objects.filter(election_id=election_id).select_related('election')
         if form.is_valid():
             form.save()
             messages.success(request, "New Candidate Created")
@@ -326,6 +367,7 @@ def ballot_title(request):
             election.title = title
             election.require_registered_voters = require_registered_voters
             election.save()
+            forget_election_title(election.id)
             messages.success(request, "Election details updated")
         else:
             messages.error(request, "No election selected")
@@ -341,25 +383,77 @@ def viewVotes(request):
     election_id = request.session.get('admin_election_id')
     if not election_id:
         return redirect(reverse('adminDashboard'))
-    votes = Votes.objects.filter(position__election_id=election_id).select_related('voter', 'candidate', 'position')
+    votes = Votes.objects.filter(election_id=election_id).select_related('voter', 'candidate', 'position')
+    paginator = KeysetPaginator(votes, 50)
     context = {
-        'votes': votes,
+        'votes': paginator.get_page(request.GET.get('cursor')),
+        'vote_count': paginator.approximate_count(),
         'page_title': 'Votes'
     }
     return render(request, "admin/votes.html", context)
 
 
+VOTE_EXPORT_COLUMNS = [
+    ('vote_id', 'id'),
+    ('sin', 'voter__sin'),
+    ('position', 'position__name'),
+    ('candidate', 'candidate__fullname'),
+    ('rank', 'rank'),
+]
+
+VOTER_EXPORT_COLUMNS = [
+    ('voter_id', 'id'),
+    ('sin', 'sin'),
+    ('voted', 'voted'),
+]
+
+
+def export_format(request):
+    fmt = request.GET.get('format', 'csv')
+    return fmt if fmt in EXPORT_FORMATS else 'csv'
+
+
+@login_required
+def exportVotes(request):
+    election_id = request.session.get('admin_election_id')
+    if not election_id:
+        return redirect(reverse('adminDashboard'))
+    votes = Votes.objects.filter(election_id=election_id).order_by('id')
+    return stream_export(votes, VOTE_EXPORT_COLUMNS, f"votes-{election_id}", export_format(request))
+
+
+@login_required
+def exportVoters(request):
+    election_id = request.session.get('admin_election_id')
+    if not election_id:
+        return redirect(reverse('adminDashboard'))
+    voters = Voter.objects.filter(election_id=election_id).order_by('id')
+    return stream_export(voters, VOTER_EXPORT_COLUMNS, f"voters-{election_id}", export_format(request))
+
+
 @login_required
 def resetVote(request):
     election_id = request.session.get('admin_election_id')
     if not election_id:
         return redirect(reverse('adminDashboard'))
         
-    Votes.objects.filter(position__election_id=election_id).delete()
-    Voter.objects.filter(election_id=election_id).update(voted=False)
-    messages.success(request, "All votes for this election have been reset")
+    # Large elections take a while to clear, so the reset runs on a
+    # background worker and this page follows its progress
+    job = start_vote_reset(election_id)
+    if job.status == BackgroundJob.FAILED:
+        messages.error(request, "Votes could not be reset")
+    elif job.status != BackgroundJob.DONE:
+        context = {'job': job, 'page_title': "Resetting Votes"}
+        return render(request, "admin/reset_status.html", context)
+    else:
+        messages.success(request, "All votes for this election have been reset")
     return redirect(reverse('viewVotes'))
 
+
+@login_required
+def reset_status(request, job_id):
+    return job_status(request, job_id, BackgroundJob.RESET_VOTES)
+
 @login_required
 def select_election(request):
     if request.user.user_type != '1' and not request.user.is_superuser:
@@ -427,20 +521,6 @@ def toggle_election_status(request):
     return redirect(reverse('adminDashboard'))
 
 
-def find_n_winners(data, n):
-    final_list = []
-    candidate_data = data[:]
-    for i in range(0, n):
-        max1 = 0
-        if len(candidate_data) == 0:
-            continue
-        this_winner = max(candidate_data, key=lambda x: x['votes'])
-        this = this_winner['name'] + " with " + str(this_winner['votes']) + " votes"
-        final_list.append(this)
-        candidate_data.remove(this_winner)
-    return ", &nbsp;".join(final_list)
-
-
 class PrintView(PDFView):
     template_name = 'admin/print.html'
     prompt_download = True
@@ -449,61 +529,61 @@ class PrintView(PDFView):
     def download_name(self):
         return "result.pdf"
 
+    def get(self, request, *args, **kwargs):
+        election_id = request.session.get('admin_election_id')
+        # The ?html preview and the no-election page are cheap, render them inline
+        if not election_id or request.GET.get('html'):
+            return super().get(request, *args, **kwargs)
+
+        # Rendering happens on a background worker; finished reports are
+        # kept per results version and streamed back on repeat downloads
+        job = results_report(election_id, results_source(request.GET.get('source')))
+        if job.status != BackgroundJob.DONE:
+            context = {'job': job, 'page_title': "Results Report"}
+            return render(request, "admin/print_status.html", context)
+        pdf = BackgroundJob.objects.values_list('result', flat=True).get(id=job.id)
+        return FileResponse(BytesIO(pdf), as_attachment=True,
+                            filename=self.download_name, content_type='application/pdf')
+
     def get_context_data(self, *args, **kwargs):
-        title = "E-voting"
-        # Logic needs to fetch title from current election if possible, or context
-        # But this is a Class Based View, getting session is tricky? 
-        # request is available in self.request
-        election_id = self.request.session.get('admin_election_id')
-        if election_id:
-            try:
-                election = Election.objects.get(id=election_id)
-                title = election.title
-            except:
-                pass
-                
         context = super().get_context_data(*args, **kwargs)
-        position_data = {}
-        
-        # Filter by election if selected
+        election_id = self.request.session.get('admin_election_id')
         if election_id:
-            positions = Position.objects.filter(election_id=election_id)
+            context.update(report_context(election_id, results_source(self.request.GET.get('source'))))
         else:
-            positions = Position.objects.none() # Or all? Better none for safety if not selected.
-
-        for position in positions:
-            candidate_data = []
-            winner = ""
-            for candidate in Candidate.objects.filter(position=position):
-                this_candidate_data = {}
-                votes = Votes.objects.filter(candidate=candidate).count()
-                this_candidate_data['name'] = candidate.fullname
-                this_candidate_data['votes'] = votes
-                candidate_data.append(this_candidate_data)
-            
-            if len(candidate_data) < 1:
-                winner = "Position does not have candidates"
-            else:
-                if position.max_vote > 1:
-                    winner = find_n_winners(candidate_data, position.max_vote)
-                else:
-                    winner = max(candidate_data, key=lambda x: x['votes'])
-                    if winner['votes'] == 0:
-                        winner = "No one voted for this yet."
-                    else:
-                        count = sum(1 for d in candidate_data if d.get('votes') == winner['votes'])
-                        if count > 1:
-                            winner = f"There are {count} candidates with {winner['votes']} votes"
-                        else:
-                            winner = "Winner : " + winner['name']
-            
-            position_data[position.name] = {
-                'candidate_data': candidate_data, 'winner': winner, 'max_vote': position.max_vote}
-        context['positions'] = position_data
-        context['election_title'] = title
+            context.update({'positions': {}, 'election_title': "E-voting"})
         return context
 
 
+def job_status(request, job_id, kind):
+    election_id = request.session.get('admin_election_id')
+    # A job lost to a restart reports failed, so the page stops polling
+    fail_stale_jobs(id=job_id)
+    job = BackgroundJob.objects.filter(
+        id=job_id, kind=kind, election_id=election_id
+    ).values('status', 'progress').first()
+    if not job:
+        return JsonResponse({'code': 404})
+    job['code'] = 200
+    return JsonResponse(job)
+
+
+@login_required
+def print_status(request, job_id):
+    return job_status(request, job_id, BackgroundJob.RESULTS_PDF)
+
+
+@login_required
+def requestStats(request):
+    # Aggregates of this process only; POST starts a fresh measurement window
+    if request.method == 'POST':
+        metrics.clear()
+    return JsonResponse({
+        'enabled': getattr(settings, 'REQUEST_METRICS', False),
+        'views': metrics.snapshot(),
+    })
+
+
 @login_required
 def update_ballot_position(request, position_id, up_or_down):
     try:
@@ -511,7 +591,10 @@ def update_ballot_position(request, position_id, up_or_down):
             'error': False
         }
         position = Position.objects.get(id=position_id)
-        election_id = position.election.id # Use position's election context
+        election_id = position.election_id # Use position's election context
+        # Swapping relies on contiguous priorities, so close any gaps first
+        positions = renumber_positions(election_id)
+        position = next(p for p in positions if p.id == position.id)
         
         if up_or_down == 'up':
             priority = position.priority - 1
@@ -527,7 +610,7 @@ def update_ballot_position(request, position_id, up_or_down):
                 output = "Moved Up"
         else:
             priority = position.priority + 1
-            if priority > Position.objects.filter(election_id=election_id).count():
+            if priority > len(positions):
                 output = "This position is already at the bottom"
                 context['error'] = True
             else:
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'account.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -89,10 +90,12 @@ WSGI_APPLICATION = 'e_voting.wsgi.application'
 
 # ...
 
+# Under ASGI each request runs its sync code on a thread of its own, so
+# persistent connections pile up; set CONN_MAX_AGE=0 there
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', 600))
     )
 }
 
@@ -127,7 +130,30 @@ STATICFILES_DIRS = [
 AUTH_USER_MODEL = 'account.CustomUser'
 AUTHENTICATION_BACKENDS = ['account.email_backend.EmailBackend']
 
-ELECTION_TITLE_PATH = os.path.join(
-    BASE_DIR, 'election_title.txt')  # Election Title File
-
 SEND_OTP = True  # If you toggle this to False, Kindly use 0000 as your OTP
+
+# Background jobs (results PDFs) run on an in-process thread pool
+BACKGROUND_JOB_WORKERS = int(os.environ.get('BACKGROUND_JOB_WORKERS', 2))
+BACKGROUND_JOBS_EAGER = False  # Run jobs inline in the request, e.g. for tests
+# Seconds a pending or running job may go without progress before it is
+# taken as lost to a restart and may be started again
+BACKGROUND_JOB_STALE_AFTER = 15 * 60
+
+# Where result counts come from by default: 'tally' (maintained totals),
+# 'votes' (grouped query) or 'numpy' (needs numpy installed)
+RESULTS_SOURCE = 'tally'
+
+# Per-request timing and query counts, logged to e_voting.requests and
+# summarised at /administrator/stats/requests/; off unless REQUEST_METRICS=True
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'e_voting.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
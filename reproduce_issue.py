@@ -15,7 +15,7 @@ def check_votes():
     
     for election in elections:
         print(f"Checking election: {election.title} (ID: {election.id})")
-        votes = Votes.objects.filter(position__election_id=election.id)
+        votes = Votes.objects.filter(election_id=election.id)
         print(f"Found {votes.count()} votes.")
         
         for i, vote in enumerate(votes):
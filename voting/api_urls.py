@@ -2,7 +2,7 @@ from django.urls import path
 from . import api_views
 
 urlpatterns = [
-    path('ballot/', api_views.ballot_api_view, name='api_ballot'),
+    path('ballot/<int:election_id>/', api_views.ballot_api_view, name='api_ballot'),
     path('preview/', api_views.preview_vote_api_view, name='api_preview_vote'),
     path('submit/', api_views.submit_ballot_api_view, name='api_submit_ballot'),
     path('verify-otp/', api_views.verify_otp_api_view, name='api_verify_otp'),
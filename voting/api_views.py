@@ -5,39 +5,41 @@ from rest_framework.response import Response
 from django.utils.text import slugify
 from django.conf import settings
 from django.contrib import messages
-from .models import Position, Candidate, Voter, Votes
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .models import Position, Voter, Votes, Election
+from .ballot import load_ballot, ballot_etag, get_ballot_payload
 from .serializers import (
-    PositionSerializer, CandidateSerializer, VoteSerializer,
-    VoterSerializer, OTPVerificationSerializer, BallotSerializer
+    VoteSerializer, VoterSerializer, OTPVerificationSerializer, BallotSerializer
 )
-from .views import generate_otp, send_sms, bypass_otp
+from .views import cast_ballot, generate_otp, send_sms, bypass_otp
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def ballot_api_view(request):
-    """API endpoint to get ballot data (positions and candidates)"""
+def ballot_api_view(request, election_id):
+    """API endpoint to get the ballot (positions and candidates) of an election"""
     if request.user.user_type != '2':  # Only voters
         return Response(
             {'error': 'Only voters can access ballot'},
             status=status.HTTP_403_FORBIDDEN
         )
-    
-    positions = Position.objects.order_by('priority').all()
-    positions_data = PositionSerializer(positions, many=True).data
-    
-    # Get candidates for each position
-    candidates_data = {}
-    for position in positions:
-        candidates = Candidate.objects.filter(position=position)
-        candidates_data[position.id] = CandidateSerializer(
-            candidates, many=True, context={'request': request}
-        ).data
-    
-    return Response({
-        'positions': positions_data,
-        'candidates': candidates_data
-    }, status=status.HTTP_200_OK)
+
+    election = Election.objects.filter(id=election_id).first()
+    if election is None:
+        return Response({'error': 'Election not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Clients re-fetching an unchanged ballot get a bodiless 304
+    etag = ballot_etag(election)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    # The payload is already JSON, so skip the renderer and send the bytes
+    response = HttpResponse(get_ballot_payload(election), content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @api_view(['POST'])
@@ -62,13 +64,31 @@ def preview_vote_api_view(request):
     error = False
     error_message = None
     
-    positions = Position.objects.all()
+    ballot = load_ballot()
     
-    for position in positions:
+    for position in ballot.positions:
         max_vote = position.max_vote
         pos = slugify(position.name)
         
-        if position.max_vote > 1:
+        if position.voting_method == Position.RANKED:
+            # Candidates in preference order, blanks skipped
+            selected_candidate_ids = votes_data.get(pos, [])
+            if not isinstance(selected_candidate_ids, list):
+                selected_candidate_ids = [selected_candidate_ids]
+            ranking = ballot.get_ranking(position, selected_candidate_ids)
+            if ranking is None:
+                error = True
+                error_message = "Invalid candidate selected"
+                break
+            if ranking:
+                preview_list.append({
+                    'position': position.name,
+                    'candidates': [
+                        {'id': candidate.id, 'fullname': candidate.fullname, 'rank': rank}
+                        for rank, candidate in enumerate(ranking, start=1)
+                    ],
+                })
+        elif position.max_vote > 1:
             # Multiple votes allowed
             position_key = pos
             selected_candidate_ids = votes_data.get(position_key, [])
@@ -83,16 +103,15 @@ def preview_vote_api_view(request):
             
             candidates = []
             for candidate_id in selected_candidate_ids:
-                try:
-                    candidate = Candidate.objects.get(id=candidate_id, position=position)
-                    candidates.append({
-                        'id': candidate.id,
-                        'fullname': candidate.fullname,
-                    })
-                except Candidate.DoesNotExist:
+                candidate = ballot.get_candidate(position, candidate_id)
+                if candidate is None:
                     error = True
                     error_message = "Invalid candidate selected"
                     break
+                candidates.append({
+                    'id': candidate.id,
+                    'fullname': candidate.fullname,
+                })
             
             if error:
                 break
@@ -116,19 +135,18 @@ def preview_vote_api_view(request):
             if not selected_candidate_id:
                 continue
             
-            try:
-                candidate = Candidate.objects.get(id=selected_candidate_id, position=position)
-                preview_list.append({
-                    'position': position.name,
-                    'candidates': [{
-                        'id': candidate.id,
-                        'fullname': candidate.fullname,
-                    }],
-                })
-            except Candidate.DoesNotExist:
+            candidate = ballot.get_candidate(position, selected_candidate_id)
+            if candidate is None:
                 error = True
                 error_message = "Invalid candidate selected"
                 break
+            preview_list.append({
+                'position': position.name,
+                'candidates': [{
+                    'id': candidate.id,
+                    'fullname': candidate.fullname,
+                }],
+            })
     
     if error:
         return Response(
@@ -169,103 +187,76 @@ def submit_ballot_api_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    positions = Position.objects.all()
-    form_count = 0
-    created_votes = []
+    # Validate the whole ballot in memory before touching the database
+    ballot = load_ballot()
+    new_votes = []
     
-    try:
-        for position in positions:
-            max_vote = position.max_vote
-            pos = slugify(position.name)
-            
-            if position.max_vote > 1:
-                # Multiple votes
-                position_key = pos
-                selected_candidate_ids = votes_data.get(position_key, [])
-                
-                if not selected_candidate_ids:
-                    continue
-                
-                if len(selected_candidate_ids) > max_vote:
-                    # Rollback
-                    Votes.objects.filter(voter=voter, id__in=[v.id for v in created_votes]).delete()
-                    return Response(
-                        {'error': f'You can only choose {max_vote} candidates for {position.name}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                for candidate_id in selected_candidate_ids:
-                    try:
-                        candidate = Candidate.objects.get(id=candidate_id, position=position)
-                        vote = Votes.objects.create(
-                            candidate=candidate,
-                            voter=voter,
-                            position=position
-                        )
-                        created_votes.append(vote)
-                        form_count += 1
-                    except Candidate.DoesNotExist:
-                        Votes.objects.filter(voter=voter, id__in=[v.id for v in created_votes]).delete()
-                        return Response(
-                            {'error': 'Invalid candidate selected'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-            else:
-                # Single vote
-                position_key = pos
-                selected_candidate_id = votes_data.get(position_key)
-                
-                if not selected_candidate_id:
-                    continue
-                
-                # Handle both list and single value
-                if isinstance(selected_candidate_id, list):
-                    selected_candidate_id = selected_candidate_id[0] if selected_candidate_id else None
-                
-                if not selected_candidate_id:
-                    continue
-                
-                try:
-                    candidate = Candidate.objects.get(id=selected_candidate_id, position=position)
-                    vote = Votes.objects.create(
-                        candidate=candidate,
-                        voter=voter,
-                        position=position
-                    )
-                    created_votes.append(vote)
-                    form_count += 1
-                except Candidate.DoesNotExist:
-                    Votes.objects.filter(voter=voter, id__in=[v.id for v in created_votes]).delete()
-                    return Response(
-                        {'error': 'Invalid candidate selected'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+    for position in ballot.positions:
+        max_vote = position.max_vote
+        position_key = slugify(position.name)
+        selected_candidate_ids = votes_data.get(position_key)
         
-        # Verify vote count
-        inserted_votes = Votes.objects.filter(voter=voter)
-        if inserted_votes.count() != form_count:
-            inserted_votes.delete()
-            return Response(
-                {'error': 'Vote submission failed. Please try again.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        if not selected_candidate_ids:
+            continue
         
-        # Mark voter as voted
-        voter.voted = True
-        voter.save()
+        # Handle both list and single value
+        if not isinstance(selected_candidate_ids, list):
+            selected_candidate_ids = [selected_candidate_ids]
         
-        return Response({
-            'success': True,
-            'message': 'Vote submitted successfully'
-        }, status=status.HTTP_200_OK)
+        if position.voting_method == Position.RANKED:
+            # The list is the ranking, first preference first
+            ranking = ballot.get_ranking(position, selected_candidate_ids)
+            if ranking is None:
+                return Response(
+                    {'error': 'Invalid candidate selected'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            new_votes.extend(
+                Votes(election_id=position.election_id, candidate=candidate, voter=voter, position=position, rank=rank)
+                for rank, candidate in enumerate(ranking, start=1)
+            )
+            continue
         
-    except Exception as e:
-        # Rollback on any error
-        Votes.objects.filter(voter=voter, id__in=[v.id for v in created_votes]).delete()
+        if position.max_vote > 1:
+            # Multiple votes
+            if len(selected_candidate_ids) > max_vote:
+                return Response(
+                    {'error': f'You can only choose {max_vote} candidates for {position.name}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            # Single vote
+            selected_candidate_ids = selected_candidate_ids[:1]
+        
+        candidates = [ballot.get_candidate(position, candidate_id) for candidate_id in selected_candidate_ids]
+        # Compare resolved ids, not the posted values: "1" and "01" are the same candidate
+        if None in candidates or len({candidate.id for candidate in candidates}) != len(candidates):
+            return Response(
+                {'error': 'Invalid candidate selected'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        new_votes.extend(
+            Votes(election_id=position.election_id, candidate=candidate, voter=voter, position=position)
+            for candidate in candidates
+        )
+    
+    # Blank rankings leave nothing to cast; that must not use up the vote
+    if not new_votes:
+        return Response(
+            {'error': 'Please select at least one candidate'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not cast_ballot(voter, new_votes):
         return Response(
-            {'error': f'An error occurred: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': 'You have already voted'},
+            status=status.HTTP_400_BAD_REQUEST
         )
+    
+    return Response({
+        'success': True,
+        'message': 'Vote submitted successfully'
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
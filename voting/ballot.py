@@ -0,0 +1,119 @@
+import json
+from django.core.cache import cache
+from .models import Position, Candidate
+
+BALLOT_PAYLOAD_TIMEOUT = 60 * 60
+
+
+class ElectionBallot:
+    """Positions and candidates of a ballot, loaded in two queries and indexed in memory"""
+
+    def __init__(self, positions, candidates=None):
+        self.positions = list(positions)
+        positions_by_id = {position.id: position for position in self.positions}
+        self.candidates_by_position = {position.id: [] for position in self.positions}
+        self.candidates = {}
+        self.candidate_index = {}
+        if candidates is None:
+            candidates = ballot_candidates(positions_by_id)
+        for candidate in candidates:
+            position = positions_by_id[candidate.position_id]
+            # Reuse the loaded position so candidate.position never queries
+            candidate.position = position
+            self.candidates_by_position[position.id].append(candidate)
+            self.candidates[candidate.id] = candidate
+            self.candidate_index[candidate.id] = (position, candidate.fullname)
+
+    def candidates_for(self, position):
+        return self.candidates_by_position.get(position.id, [])
+
+    def get_candidate(self, position, candidate_id):
+        # Form values arrive as strings; anything that is not a candidate of
+        # this position is treated the same as an unknown id
+        try:
+            candidate = self.candidates.get(int(candidate_id))
+        except (TypeError, ValueError):
+            return None
+        if candidate is None or candidate.position_id != position.id:
+            return None
+        return candidate
+
+    def get_ranking(self, position, candidate_ids):
+        """Candidates of a ranked position in the order given, skipping blank choices
+
+        None if any choice is not a candidate of the position or repeats one.
+        """
+        ranking = []
+        for candidate_id in candidate_ids:
+            if candidate_id == '':
+                continue
+            candidate = self.get_candidate(position, candidate_id)
+            if candidate is None or candidate in ranking:
+                return None
+            ranking.append(candidate)
+        return ranking
+
+
+def ballot_positions(election_id=None):
+    # Position.__str__ shows the election title, which templates render
+    positions = Position.objects.select_related('election').order_by('priority', 'id')
+    if election_id is not None:
+        positions = positions.filter(election_id=election_id)
+    return positions
+
+
+def ballot_candidates(position_ids):
+    return Candidate.objects.filter(position_id__in=position_ids).order_by('id')
+
+
+def load_ballot(election_id=None):
+    """Load the ballot of an election; None loads every election, as the legacy API does"""
+    return ElectionBallot(ballot_positions(election_id))
+
+
+async def aload_ballot(election_id):
+    """load_ballot() for async views, through the async ORM"""
+    positions = [position async for position in ballot_positions(election_id)]
+    candidates = [candidate async for candidate in ballot_candidates([p.id for p in positions])]
+    return ElectionBallot(positions, candidates)
+
+
+def ballot_etag(election):
+    """Validator that changes whenever the ballot or the election itself is edited"""
+    return f'"{election.id}.{election.ballot_version}.{int(election.updated_at.timestamp() * 1e6)}"'
+
+
+def build_ballot_payload(election):
+    ballot = load_ballot(election.id)
+    return json.dumps({
+        'election': {'id': election.id, 'title': election.title},
+        'positions': [
+            {'id': p.id, 'name': p.name, 'max_vote': p.max_vote, 'priority': p.priority,
+             'voting_method': p.voting_method}
+            for p in ballot.positions
+        ],
+        'candidates': {
+            position.id: [
+                {
+                    'id': c.id,
+                    'fullname': c.fullname,
+                    'photo_url': c.photo.url if c.photo else None,
+                    'bio': c.bio,
+                    'position': position.id,
+                    'position_name': position.name,
+                }
+                for c in ballot.candidates_for(position)
+            ]
+            for position in ballot.positions
+        },
+    }, separators=(',', ':')).encode()
+
+
+def get_ballot_payload(election):
+    """The ballot of an election as compact JSON bytes, built once per ballot_etag()"""
+    key = f"ballot-json:{ballot_etag(election)}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_ballot_payload(election)
+        cache.set(key, payload, BALLOT_PAYLOAD_TIMEOUT)
+    return payload
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import django
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils.text import slugify
+from .ballot import load_ballot
+from .models import Election, Position, Candidate, Voter, Votes
+from .tallies import rebuild_tallies
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def write_report(command, report, path=None):
+    """Print a benchmark report as JSON, or write it to ``path``"""
+    output = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(output + "\n")
+        command.stdout.write(command.style.SUCCESS(f"Wrote {path}"))
+    else:
+        command.stdout.write(output)
+
+
+@contextmanager
+def benchmark_database():
+    """Run the block against a freshly migrated test database, dropped afterwards"""
+    # Threads need a database they can share, which in-memory SQLite isn't
+    if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            tempfile.gettempdir(), 'benchmark_voting.sqlite3')
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_elections(admin, elections=1, positions=5, candidates=4, voters=1000):
+    """Create ``elections`` elections of ``positions`` x ``candidates`` with ``voters`` registered SINs
+
+    Every other position allows two selections so both ballot input kinds
+    are exercised. Returns the elections.
+    """
+    seeded = []
+    for e in range(elections):
+        election = Election.objects.create(title=f"Benchmark Election {e + 1}", created_by=admin)
+        Position.objects.bulk_create([
+            Position(election=election, name=f"Position {p + 1}", max_vote=1 + p % 2, priority=p + 1)
+            for p in range(positions)
+        ])
+        Candidate.objects.bulk_create([
+            Candidate(position=position, fullname=f"Candidate {position.priority}.{c + 1}", bio="Benchmark candidate")
+            for position in Position.objects.filter(election=election)
+            for c in range(candidates)
+        ])
+        Voter.objects.bulk_create([
+            Voter(election=election, sin=f"B{e + 1}-{v + 1}") for v in range(voters)
+        ], batch_size=2000)
+        rebuild_tallies(election.id)
+        seeded.append(election)
+    return seeded
+
+
+def seed_votes(election, votes, batch_size=10000):
+    """Cast about ``votes`` votes in an election, one per position per new voter
+
+    Candidates are picked with a skew so the counts are not all equal.
+    Tallies are rebuilt at the end. Returns the number of votes written.
+    """
+    ballot = load_ballot(election.id)
+    positions = [p for p in ballot.positions if ballot.candidates_for(p)]
+    rng = random.Random(election.id)
+    voters = -(-votes // len(positions))
+    written = 0
+    for start in range(0, voters, batch_size):
+        new_voters = Voter.objects.bulk_create([
+            Voter(election=election, sin=f"V{election.id}-{v}", voted=True)
+            for v in range(start, min(start + batch_size, voters))
+        ])
+        batch = []
+        for voter in new_voters:
+            for position in positions:
+                candidates = ballot.candidates_for(position)
+                candidate = candidates[min(int(rng.expovariate(1.0)), len(candidates) - 1)]
+                batch.append(Votes(election=election, voter=voter, position=position, candidate=candidate))
+        Votes.objects.bulk_create(batch, batch_size=batch_size)
+        written += len(batch)
+    rebuild_tallies(election.id)
+    return written
+
+
+def ballot_form(ballot, election_id, rng):
+    """POST data selecting random candidates on every position of a ballot"""
+    data = {'election_id': election_id}
+    for position in ballot.positions:
+        candidates = ballot.candidates_for(position)
+        if not candidates:
+            continue
+        chosen = rng.sample(candidates, min(position.max_vote, len(candidates)))
+        if position.max_vote > 1:
+            data[slugify(position.name) + "[]"] = [c.id for c in chosen]
+        else:
+            data[slugify(position.name)] = chosen[0].id
+    return data
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, wall):
+    """Summary dict of ``(seconds, queries, ok)`` samples taken over ``wall`` seconds
+
+    ``queries`` is None where they could not be counted.
+    """
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+    }
+    counted = [q for _, q, _ in samples if q is not None]
+    if counted:
+        summary['queries_per_request'] = round(sum(counted) / len(counted), 2)
+    return summary
+
+
+class SlowDatabase:
+    """Execute wrapper that sleeps ``latency`` seconds before every query
+
+    Stands in for a database across a network, where requests spend their
+    time waiting on round trips. While active it is added to every
+    connection as it opens, whichever thread opens it.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        connections.close_all()
+        connection_created.connect(self.attach)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.attach)
+        for conn in connections.all(initialized_only=True):
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+        connections.close_all()
+
+
+class BenchmarkRun:
+    """Drives the voting flow against seeded elections from a pool of threads
+
+    Each scenario is a method ``(client, election, rng)`` issuing one
+    request; :meth:`run` fires it ``requests`` times over ``concurrency``
+    threads, each with its own Client and database connection.
+    :meth:`run_async` drives the voter scenarios through an AsyncClient
+    instead, as an ASGI server would.
+    """
+
+    def __init__(self, admin, elections, concurrency=4, seed=0):
+        self.admin = admin
+        self.elections = elections
+        self.concurrency = concurrency
+        self.seed = seed
+        self.ballots = {election.id: load_ballot(election.id) for election in elections}
+        self.sins = {
+            election.id: list(Voter.objects.filter(election=election, voted=False).order_by(
+                'id').values_list('sin', flat=True))
+            for election in elections
+        }
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def client(self, admin=False):
+        clients = self.local.__dict__.setdefault('clients', {})
+        if admin not in clients:
+            client = Client(raise_request_exception=False)
+            if admin:
+                client.force_login(self.admin)
+            clients[admin] = client
+        return clients[admin]
+
+    def next_sin(self, election):
+        with self.lock:
+            sins = self.sins[election.id]
+            return sins.pop() if sins else None
+
+    # Voter scenarios return the client's response, or with an AsyncClient
+    # the coroutine producing it
+
+    def show_ballot(self, client, election, rng):
+        return client.get(reverse('show_ballot', args=[election.id]))
+
+    def preview_vote(self, client, election, rng):
+        data = ballot_form(self.ballots[election.id], election.id, rng)
+        return client.post(reverse('preview_vote'), data)
+
+    def submit_ballot(self, client, election, rng):
+        data = ballot_form(self.ballots[election.id], election.id, rng)
+        data['sin'] = self.next_sin(election)
+        if data['sin'] is None:
+            raise RuntimeError("Ran out of unvoted SINs; seed more voters")
+        return client.post(reverse('submit_ballot'), data)
+
+    def admin_get(self, election, url):
+        client = self.client(admin=True)
+        session = client.session
+        if session.get('admin_election_id') != election.id:
+            session['admin_election_id'] = election.id
+            session.save()
+        return client.get(url)
+
+    def dashboard(self, client, election, rng):
+        return self.admin_get(election, reverse('adminDashboard'))
+
+    def print_result(self, client, election, rng):
+        return self.admin_get(election, reverse('printResult'))
+
+    SCENARIOS = ['show_ballot', 'preview_vote', 'submit_ballot', 'dashboard', 'print_result']
+    ASYNC_SCENARIOS = ['show_ballot', 'preview_vote', 'submit_ballot']
+
+    def request(self, scenario, index):
+        rng = random.Random(f"{self.seed}:{scenario}:{index}")
+        election = self.elections[index % len(self.elections)]
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            try:
+                response = getattr(self, scenario)(self.client(), election, rng)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries), ok
+
+    def worker(self, scenario, indexes):
+        try:
+            return [self.request(scenario, index) for index in indexes]
+        finally:
+            connection.close()
+
+    def run(self, scenario, requests):
+        """Time ``requests`` calls of a scenario; returns its summary dict"""
+        shards = [range(i, requests, self.concurrency) for i in range(self.concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            samples = [s for shard in pool.map(lambda shard: self.worker(scenario, shard), shards) for s in shard]
+        return summarize(samples, time.perf_counter() - start)
+
+    async def arequest(self, client, scenario, index, slots):
+        rng = random.Random(f"{self.seed}:{scenario}:{index}")
+        election = self.elections[index % len(self.elections)]
+        async with slots:
+            # ASGIHandler gives each request its own thread for sync code;
+            # the test client does not, so do it here
+            async with ThreadSensitiveContext():
+                start = time.perf_counter()
+                try:
+                    response = await getattr(self, scenario)(client, election, rng)
+                    ok = response.status_code < 400
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                await sync_to_async(connections.close_all)()
+        return elapsed, None, ok
+
+    def run_async(self, scenario, requests, concurrency):
+        """Time ``requests`` calls of a voter scenario, at most ``concurrency`` in flight on one event loop"""
+        async def fire():
+            client = AsyncClient(raise_request_exception=False)
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(
+                self.arequest(client, scenario, index, slots) for index in range(requests)))
+
+        start = time.perf_counter()
+        samples = asyncio.run(fire())
+        return summarize(samples, time.perf_counter() - start)
@@ -1,13 +1,50 @@
-from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import lazy
+from .models import Election, Voter
+
+DEFAULT_TITLE = "No Title Yet"
+TITLE_CACHE_TIMEOUT = 60 * 5
+
+
+def election_title_key(election_id):
+    return f"election_title:{election_id}"
+
+
+def get_election_title(election_id):
+    key = election_title_key(election_id)
+    title = cache.get(key)
+    if title is None:
+        title = Election.objects.filter(id=election_id).values_list('title', flat=True).first()
+        title = title or DEFAULT_TITLE
+        cache.set(key, title, TITLE_CACHE_TIMEOUT)
+    return title
+
+
+def forget_election_title(election_id):
+    cache.delete(election_title_key(election_id))
+
+
+def request_election_id(request):
+    # Ballot pages carry the election in the URL, admins in their session,
+    # and voters through their Voter row
+    match = request.resolver_match
+    if match and match.kwargs.get('election_id'):
+        return match.kwargs['election_id']
+    if request.session.get('admin_election_id'):
+        return request.session['admin_election_id']
+    voter_id = request.session.get('voter_id')
+    if voter_id:
+        return Voter.objects.filter(id=voter_id).values_list('election_id', flat=True).first()
+    return None
+
+
+def request_title(request):
+    election_id = request_election_id(request)
+    if not election_id:
+        return DEFAULT_TITLE
+    return get_election_title(election_id)
 
 
 def ElectionTitle(request):
-    context = {}
-    title = "No Title Yet"
-    try:
-        file = open(settings.ELECTION_TITLE_PATH, 'r')
-        title = file.read()
-    except:
-        pass
-    context['TITLE'] = title
-    return context
+    # Lazy, so pages that never print the title never look it up
+    return {'TITLE': lazy(request_title, str)(request)}
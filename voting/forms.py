@@ -12,7 +12,16 @@ class VoterForm(FormSettings):
 class PositionForm(FormSettings):
     class Meta:
         model = Position
-        fields = ['name', 'max_vote']
+        fields = ['name', 'max_vote', 'voting_method']
+
+    def clean_voting_method(self):
+        voting_method = self.cleaned_data.get('voting_method')
+        if self.instance.pk is not None and voting_method != self.instance.voting_method:
+            # Plurality and ranked votes are stored differently; cast ones would be miscounted
+            if Votes.objects.filter(position_id=self.instance.pk).exists():
+                raise forms.ValidationError(
+                    "The voting method cannot change once votes have been cast for this position")
+        return voting_method
 
 
 class CandidateForm(FormSettings):
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from account.models import CustomUser
+from voting.benchmark import (
+    BenchmarkRun, SlowDatabase, benchmark_database, environment, git_commit, seed_elections, write_report)
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway test database and compare the voting views served by sync "
+            "workers with the same views on one event loop, with every query slowed down")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latency-ms', type=float, default=20.0,
+                            help="Simulated database round trip added to every query")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Sync workers, one request each at a time, as WEB_CONCURRENCY")
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Requests in flight on the event loop")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario and mode")
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenario', action='append', choices=BenchmarkRun.ASYNC_SCENARIOS,
+                            help="Run only these scenarios (repeatable); all by default")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--workers and --concurrency must be at least 1")
+        with benchmark_database():
+            report = self.benchmark(options)
+        write_report(self, report, options['output'])
+
+    def benchmark(self, options):
+        admin = CustomUser.objects.create_user(
+            email="benchmark@admin.local", password="benchmark", user_type='1')
+        # Both modes submit, each with fresh SINs
+        elections = seed_elections(
+            admin, elections=1, positions=options['positions'],
+            candidates=options['candidates'], voters=2 * options['requests'])
+        connection.close()
+
+        run = BenchmarkRun(admin, elections, concurrency=options['workers'], seed=options['seed'])
+        scenarios = {}
+        with SlowDatabase(options['latency_ms'] / 1000):
+            for scenario in options['scenario'] or BenchmarkRun.ASYNC_SCENARIOS:
+                scenarios[scenario] = {
+                    'sync_workers': run.run(scenario, options['requests']),
+                    'asgi': run.run_async(scenario, options['requests'], options['concurrency']),
+                }
+                for mode, summary in scenarios[scenario].items():
+                    self.stderr.write(f"{scenario:14} {mode:12} {summary}")
+        return {
+            'commit': git_commit(),
+            'environment': environment(),
+            'config': {key: options[key] for key in (
+                'latency_ms', 'workers', 'concurrency', 'requests', 'positions', 'candidates', 'seed')},
+            'scenarios': scenarios,
+        }
@@ -0,0 +1,61 @@
+import time
+from django.core.management.base import BaseCommand
+from account.models import CustomUser
+from voting.benchmark import (
+    benchmark_database, environment, git_commit, percentile, seed_elections, seed_votes, write_report)
+from voting.results import RESULT_SOURCES, election_results
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway test database with elections of growing size and time "
+            "election_results from every result source, reporting JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, action='append',
+                            help="Votes in one election (repeatable); 1M, 10M and 50M by default")
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per source and size")
+        parser.add_argument('--source', action='append', choices=list(RESULT_SOURCES),
+                            help="Time only these sources (repeatable); all available by default")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            report = self.benchmark(options)
+        write_report(self, report, options['output'])
+
+    def benchmark(self, options):
+        admin = CustomUser.objects.create_user(
+            email="benchmark@admin.local", password="benchmark", user_type='1')
+        sources = options['source'] or list(RESULT_SOURCES)
+        sizes = {}
+        for votes in options['votes'] or [1000000, 10000000, 50000000]:
+            election, = seed_elections(admin, elections=1, positions=options['positions'],
+                                       candidates=options['candidates'], voters=0)
+            written = seed_votes(election, votes)
+            expected = self.counts(election_results(election.id, 'tally'))
+            timings = {}
+            for source in sources:
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    results = election_results(election.id, source)
+                    samples.append(time.perf_counter() - start)
+                samples.sort()
+                timings[source] = {
+                    'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                    'max_ms': round(samples[-1] * 1000, 3),
+                    'matches_tally': self.counts(results) == expected,
+                }
+                self.stderr.write(f"{written:>10} votes  {source:6} {timings[source]}")
+            sizes[str(written)] = timings
+        return {
+            'commit': git_commit(),
+            'environment': environment(),
+            'config': {key: options[key] for key in ('positions', 'candidates', 'repeat')},
+            'votes': sizes,
+        }
+
+    def counts(self, results):
+        return [[(c.id, c.votes) for c in result.candidates] for result in results]
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from account.models import CustomUser
+from voting.benchmark import BenchmarkRun, benchmark_database, environment, git_commit, seed_elections, write_report
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway test database and load-test the voting flow, "
+            "reporting latency percentiles, throughput and queries per request as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elections', type=int, default=1)
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4)
+        parser.add_argument('--voters', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenario', action='append', choices=BenchmarkRun.SCENARIOS,
+                            help="Run only these scenarios (repeatable); all by default")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        if options['requests'] > options['elections'] * options['voters']:
+            raise CommandError("submit_ballot needs a fresh voter per request; raise --voters")
+
+        # Reports render inline, so the first print_result request pays for
+        # the PDF and later ones measure the cached download
+        with benchmark_database(), override_settings(BACKGROUND_JOBS_EAGER=True):
+            report = self.benchmark(options)
+        write_report(self, report, options['output'])
+
+    def benchmark(self, options):
+        admin = CustomUser.objects.create_user(
+            email="benchmark@admin.local", password="benchmark", user_type='1')
+        elections = seed_elections(
+            admin, elections=options['elections'], positions=options['positions'],
+            candidates=options['candidates'], voters=options['voters'])
+        connection.close()
+
+        run = BenchmarkRun(admin, elections, concurrency=options['concurrency'], seed=options['seed'])
+        scenarios = {}
+        for scenario in options['scenario'] or BenchmarkRun.SCENARIOS:
+            scenarios[scenario] = run.run(scenario, options['requests'])
+            self.stderr.write(f"{scenario:14} {scenarios[scenario]}")
+        return {
+            'commit': git_commit(),
+            'environment': environment(),
+            'config': {key: options[key] for key in (
+                'elections', 'positions', 'candidates', 'voters', 'requests', 'concurrency', 'seed')},
+            'scenarios': scenarios,
+        }
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from voting.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries and fail if any of them reads a whole table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election-id', type=int, default=0)
+        parser.add_argument('--show-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            results = list(check_query_plans(options['election_id']))
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        failed = []
+        for name, plan, scans in results:
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if options['show_plans'] or scans:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(f"{len(failed)} hot queries do not use an index: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} hot queries use an index"))
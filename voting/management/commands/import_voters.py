@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from voting.models import Election
+from voting.voter_import import IMPORT_CHUNK_SIZE, import_voters
+
+
+class Command(BaseCommand):
+    help = "Import a CSV voter roll (SIN in the first column) into an election"
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('csv_file')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError("Election not found")
+
+        with open(options['csv_file'], newline='', encoding='utf-8-sig') as lines:
+            stats = import_voters(
+                election, lines, chunk_size=options['chunk_size'],
+                progress=lambda stats: self.stdout.write(str(stats)))
+        self.stdout.write(self.style.SUCCESS(f"Imported into {election}: {stats}"))
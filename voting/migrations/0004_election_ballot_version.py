@@ -0,0 +1,18 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0003_remove_election_end_date_remove_election_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='ballot_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
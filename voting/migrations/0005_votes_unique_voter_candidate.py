@@ -0,0 +1,30 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:07
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    # Concurrent submissions could store the same candidate twice for a
+    # voter; keep the first copy so the constraint can be added
+    Votes = apps.get_model('voting', 'Votes')
+    duplicates = Votes.objects.values('voter_id', 'candidate_id').annotate(
+        first=Min('id'), copies=Count('id')).filter(copies__gt=1)
+    for row in duplicates.iterator():
+        Votes.objects.filter(voter_id=row['voter_id'], candidate_id=row['candidate_id']).exclude(
+            id=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0004_election_ballot_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='votes',
+            unique_together={('voter', 'candidate')},
+        ),
+    ]
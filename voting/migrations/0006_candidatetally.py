@@ -0,0 +1,42 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_tallies(apps, schema_editor):
+    Candidate = apps.get_model('voting', 'Candidate')
+    CandidateTally = apps.get_model('voting', 'CandidateTally')
+    counts = Candidate.objects.values_list(
+        'id', 'position_id', 'position__election_id').annotate(total=Count('votes'))
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=election_id,
+            position_id=position_id,
+            candidate_id=candidate_id,
+            count=total,
+        )
+        for candidate_id, position_id, election_id, total in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0005_votes_unique_voter_candidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tally', to='voting.candidate')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.position')),
+            ],
+        ),
+        migrations.RunPython(build_tallies, migrations.RunPython.noop),
+    ]
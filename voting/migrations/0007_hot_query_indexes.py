@@ -0,0 +1,21 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0006_candidatetally'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['election', 'priority', 'id'], name='position_election_priority'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['election', 'voted'], name='voter_election_voted'),
+        ),
+    ]
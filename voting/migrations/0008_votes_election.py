@@ -0,0 +1,19 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votes',
+            name='election',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_election(apps, schema_editor):
+    Position = apps.get_model('voting', 'Position')
+    Votes = apps.get_model('voting', 'Votes')
+    Votes.objects.filter(election__isnull=True).update(election_id=Subquery(
+        Position.objects.filter(id=OuterRef('position_id')).values('election_id')[:1]))
+
+
+class Migration(migrations.Migration):
+    # On its own so the UPDATE commits before the ALTER TABLE that follows;
+    # PostgreSQL refuses to alter a table with pending trigger events
+
+    dependencies = [
+        ('voting', '0008_votes_election'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_election, migrations.RunPython.noop),
+    ]
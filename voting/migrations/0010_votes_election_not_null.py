@@ -0,0 +1,17 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0009_backfill_votes_election'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='votes',
+            name='election',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='voting.election'),
+        ),
+    ]
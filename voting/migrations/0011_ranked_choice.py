@@ -0,0 +1,27 @@
+# Generated by Django 6.0.9 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0010_votes_election_not_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='voting_method',
+            field=models.CharField(choices=[('plurality', 'Plurality'), ('ranked', 'Ranked choice (IRV / STV)')], default='plurality', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='votes',
+            name='rank',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='votes',
+            index=models.Index(fields=['election', 'rank', 'candidate'], name='votes_election_rank_candidate'),
+        ),
+    ]
@@ -1,4 +1,8 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from account.models import CustomUser
 # Create your models here.
 
@@ -8,6 +12,9 @@ class Election(models.Model):
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     is_open = models.BooleanField(default=True)
     require_registered_voters = models.BooleanField(default=False)
+    # Bumped whenever a position or candidate changes, so cached ballots
+    # keyed on it go stale without having to be deleted explicitly
+    ballot_version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,19 +31,36 @@ class Voter(models.Model):
 
     class Meta:
         unique_together = ('sin', 'election')
+        indexes = [
+            # Turnout counts on the dashboard
+            models.Index(fields=['election', 'voted'], name='voter_election_voted'),
+        ]
 
     def __str__(self):
         return f"{self.sin} - {self.election.title}"
 
 
 class Position(models.Model):
+    PLURALITY = 'plurality'
+    RANKED = 'ranked'
+    VOTING_METHODS = [
+        (PLURALITY, "Plurality"),
+        # Instant-runoff with one seat, single transferable vote with more
+        (RANKED, "Ranked choice (IRV / STV)"),
+    ]
+
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
     name = models.CharField(max_length=50) # Removed unique=True to allow same position name in diff elections
     max_vote = models.IntegerField()
     priority = models.IntegerField()
+    voting_method = models.CharField(max_length=10, choices=VOTING_METHODS, default=PLURALITY)
 
     class Meta:
         unique_together = ('name', 'election')
+        indexes = [
+            # Ballot order within an election
+            models.Index(fields=['election', 'priority', 'id'], name='position_election_priority'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.election.title})"
@@ -53,6 +77,72 @@ class Candidate(models.Model):
 
 
 class Votes(models.Model):
+    # Copied from position.election so election-wide queries stay on this table
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
     voter = models.ForeignKey(Voter, on_delete=models.CASCADE)
     position = models.ForeignKey(Position, on_delete=models.CASCADE)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
+    # Preference on a ranked position, 1 being first; plurality votes are
+    # all 1, so rank=1 counts first preferences everywhere
+    rank = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('voter', 'candidate')
+        indexes = [
+            # Per-election counts group by candidate without reading the rows
+            models.Index(fields=['election', 'rank', 'candidate'], name='votes_election_rank_candidate'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # bulk_create skips this, so bulk inserts set election themselves
+        if self.election_id is None and self.position_id is not None:
+            self.election_id = self.position.election_id
+        super().save(*args, **kwargs)
+
+
+class CandidateTally(models.Model):
+    # Running vote total per candidate, maintained alongside Votes so result
+    # pages read one row per candidate instead of counting Votes
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    position = models.ForeignKey(Position, on_delete=models.CASCADE)
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, related_name='tally')
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.candidate} - {self.count}"
+
+
+def bump_ballot_version(election_id):
+    # updated_at moves too, it is the Last-Modified of the ballot page
+    Election.objects.filter(id=election_id).update(
+        ballot_version=F('ballot_version') + 1, updated_at=timezone.now())
+
+
+def renumber_positions(election_id):
+    # Close the gaps left by added, deleted or reordered positions so
+    # priorities run 1..n; the ballot render path never writes them itself
+    positions = list(Position.objects.filter(election_id=election_id).order_by('priority', 'id'))
+    changed = []
+    for num, position in enumerate(positions, start=1):
+        if position.priority != num:
+            position.priority = num
+            changed.append(position)
+    if changed:
+        Position.objects.bulk_update(changed, ['priority'])
+        bump_ballot_version(election_id)
+    return positions
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+def position_changed(sender, instance, **kwargs):
+    bump_ballot_version(instance.election_id)
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+def candidate_changed(sender, instance, **kwargs):
+    # The position may already be gone when candidates are cascade-deleted,
+    # so resolve the election through a join instead of instance.position
+    Election.objects.filter(position__id=instance.position_id).update(
+        ballot_version=F('ballot_version') + 1, updated_at=timezone.now())
@@ -0,0 +1,60 @@
+import re
+from django.db import connection, transaction
+from django.db.models import Count
+from .models import Voter, Position, Candidate, Votes, CandidateTally
+
+
+# The query shapes behind login, the ballot, tallying and the admin lists,
+# built for a given election id
+HOT_QUERIES = {
+    'voter_login': lambda election_id: Voter.objects.filter(sin='0', election_id=election_id),
+    'turnout': lambda election_id: Voter.objects.filter(election_id=election_id, voted=True),
+    'voters_page': lambda election_id: Voter.objects.filter(
+        election_id=election_id, id__gt=0).order_by('id')[:51],
+    'ballot_positions': lambda election_id: Position.objects.filter(
+        election_id=election_id).order_by('priority', 'id'),
+    'ballot_candidates': lambda election_id: Candidate.objects.filter(
+        position__election_id=election_id).order_by('id'),
+    'vote_counts': lambda election_id: Votes.objects.filter(
+        election_id=election_id, rank=1).values_list('candidate_id').annotate(total=Count('id')),
+    'votes_page': lambda election_id: Votes.objects.filter(
+        election_id=election_id, id__gt=0).order_by('id')[:51],
+    'ranked_ballots': lambda election_id: Votes.objects.filter(position_id__in=[0]).order_by(
+        'position_id', 'voter_id', 'rank').values_list('position_id', 'voter_id', 'candidate_id'),
+    'tally_counts': lambda election_id: CandidateTally.objects.filter(
+        election_id=election_id).values_list('candidate_id', 'count'),
+    'voter_votes': lambda election_id: Votes.objects.filter(voter_id=0),
+    'candidate_votes': lambda election_id: Votes.objects.filter(candidate_id=0),
+}
+
+# Plan lines that read a whole table, per backend
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?P<table>\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+}
+
+
+def explain(queryset):
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    # Tiny tables make a sequential scan the cheapest plan; forbid it so the
+    # plan shows whether an index could serve the query at all
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def full_scans(plan, vendor=None):
+    """Tables a query plan reads in full"""
+    pattern = FULL_SCAN_PATTERNS[vendor or connection.vendor]
+    return [match.group('table') for match in pattern.finditer(plan)]
+
+
+def check_query_plans(election_id=0):
+    """EXPLAIN every hot query; yields (name, plan, tables read in full)"""
+    if connection.vendor not in FULL_SCAN_PATTERNS:
+        raise NotImplementedError(f"Query plans are not checked on {connection.vendor}")
+    for name, build in HOT_QUERIES.items():
+        plan = explain(build(election_id))
+        yield name, plan, full_scans(plan)
@@ -0,0 +1,155 @@
+from array import array
+from collections import Counter, namedtuple
+
+# totals: (candidate id, votes) of every continuing candidate as the round opens
+# elected: candidate ids elected this round, eliminated: candidate id or None
+# transfers: candidate id -> votes received as the round closes
+# exhausted: votes left with no continuing preference by that transfer
+# tied: candidate ids level with the one eliminated on every count, when
+#       only ballot order chose between them
+Round = namedtuple('Round', ['number', 'totals', 'elected', 'eliminated', 'transfers', 'exhausted', 'tied'])
+
+Tabulation = namedtuple('Tabulation', ['elected', 'rounds', 'quota'])
+
+CONTINUING, ELECTED, ELIMINATED = 0, 1, 2
+
+
+class RankedBallots:
+    """Ranked ballots of one position, packed into flat integer arrays
+
+    Identical rankings are stored once with the number of voters who cast
+    them. Ballot ``i`` ranks ``preferences[offsets[i]:offsets[i + 1]]``,
+    indexes into ``candidates``, and was cast ``counts[i]`` times.
+    """
+
+    def __init__(self, candidates, rankings):
+        self.candidates = list(candidates)
+        index = {candidate: i for i, candidate in enumerate(self.candidates)}
+        distinct = Counter(
+            tuple(index[candidate] for candidate in ranking if candidate in index)
+            for ranking in rankings
+        )
+        self.preferences = array('i')
+        self.offsets = array('q', [0])
+        self.counts = array('q')
+        for ranking, count in distinct.items():
+            if not ranking:
+                continue
+            self.preferences.extend(ranking)
+            self.offsets.append(len(self.preferences))
+            self.counts.append(count)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def voters(self):
+        return sum(self.counts)
+
+
+def droop_quota(votes, seats):
+    return int(votes / (seats + 1)) + 1
+
+
+def tabulate(ballots, seats):
+    """Count ranked ballots for ``seats`` seats by single transferable vote
+
+    With one seat this is instant-runoff: the quota is a majority of the
+    votes still in play. With more it is a Droop quota, and an elected
+    candidate's surplus moves on at a fractional value (inclusive Gregory
+    method). Each round elects the strongest candidate over quota, or
+    else eliminates the weakest; a tie for weakest goes to whoever was
+    behind in the latest earlier round that separates them, then to the
+    later candidate in ballot order, and the round records the tie.
+    Candidates level over quota need no tie-break: a Droop quota admits no
+    more of them than there are seats, so each is elected in turn. Ballots
+    move pile to pile, so each is touched once per transfer it takes part
+    in.
+    """
+    candidates = ballots.candidates
+    size = len(candidates)
+    preferences, offsets = ballots.preferences, ballots.offsets
+    weights = array('d', ballots.counts)
+    cursor = array('q', offsets[:-1])
+    state = bytearray(size)
+    totals = array('d', bytes(8 * size))
+    piles = [[] for _ in range(size)]
+    for b in range(len(ballots)):
+        first = preferences[offsets[b]]
+        piles[first].append(b)
+        totals[first] += weights[b]
+
+    quota = droop_quota(sum(totals), seats)
+    elected = []
+    rounds = []
+    history = []
+
+    def transfer(source, value):
+        # Move every ballot on ``source``'s pile to its next continuing
+        # preference, now worth ``value`` of what it was
+        moved = Counter()
+        exhausted = 0.0
+        for b in piles[source]:
+            weight = weights[b] * value
+            weights[b] = weight
+            p, end = cursor[b] + 1, offsets[b + 1]
+            while p < end and state[preferences[p]] != CONTINUING:
+                p += 1
+            cursor[b] = p
+            if p < end:
+                target = preferences[p]
+                piles[target].append(b)
+                totals[target] += weight
+                moved[target] += weight
+            else:
+                exhausted += weight
+        piles[source] = []
+        return moved, exhausted
+
+    while len(elected) < seats:
+        continuing = [c for c in range(size) if state[c] == CONTINUING]
+        if not continuing:
+            break
+        opening = [(candidates[c], totals[c]) for c in continuing]
+        history.append(list(totals))
+        if seats == 1:
+            quota = droop_quota(sum(totals[c] for c in continuing), 1)
+        winners, loser, tied, moved, exhausted = [], None, [], Counter(), 0.0
+
+        reached = [c for c in continuing if totals[c] >= quota]
+        if len(continuing) <= seats - len(elected):
+            # As many seats as candidates left: the ones with votes take them
+            winners = sorted((c for c in continuing if totals[c] > 0), key=lambda c: (-totals[c], c))
+            for c in winners:
+                state[c] = ELECTED
+        elif reached:
+            winner = min(reached, key=lambda c: (-totals[c], c))
+            winners = [winner]
+            state[winner] = ELECTED
+            surplus = totals[winner] - quota
+            if surplus > 0 and len(elected) + 1 < seats:
+                moved, exhausted = transfer(winner, surplus / totals[winner])
+            totals[winner] = min(totals[winner], quota)
+        else:
+            standing = {c: (totals[c], [earlier[c] for earlier in reversed(history[:-1])]) for c in continuing}
+            loser = min(continuing, key=lambda c: (standing[c], -c))
+            # Candidates without votes have no ballots to pass on; their order is moot
+            if totals[loser] > 0:
+                tied = [c for c in continuing if standing[c] == standing[loser]]
+            state[loser] = ELIMINATED
+            moved, exhausted = transfer(loser, 1.0)
+            totals[loser] = 0.0
+
+        elected.extend(winners)
+        rounds.append(Round(
+            number=len(rounds) + 1,
+            totals=opening,
+            elected=[candidates[c] for c in winners],
+            eliminated=candidates[loser] if loser is not None else None,
+            transfers={candidates[c]: votes for c, votes in moved.items()},
+            exhausted=exhausted,
+            tied=[candidates[c] for c in tied] if len(tied) > 1 else [],
+        ))
+        if not winners and loser is None:
+            break
+    return Tabulation([candidates[c] for c in elected], rounds, quota)
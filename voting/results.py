@@ -0,0 +1,154 @@
+import hashlib
+import heapq
+from collections import namedtuple
+from itertools import groupby
+from django.conf import settings
+from django.db.models import Count, Max
+from .models import Election, Position, Votes, CandidateTally
+from .ballot import load_ballot
+from .ranked import RankedBallots, tabulate
+from .tallies import tally_counts
+from .results_numpy import np, numpy_counts
+
+
+CandidateResult = namedtuple('CandidateResult', ['id', 'name', 'votes'])
+
+# winners: candidates certain of a seat, strongest first
+# tied: candidates sharing the vote count at the cutoff, when there are more
+#       of them than seats_left; on a ranked position, the candidates of any
+#       tie the count settled by ballot order
+WinnerSelection = namedtuple('WinnerSelection', ['winners', 'tied', 'seats_left'])
+
+
+def select_winners(candidates, seats):
+    """Pick the top ``seats`` candidates by votes, reporting a tie at the cutoff
+
+    Uses a bounded heap, so only the leading ``seats`` candidates are ever
+    ordered. Candidates without votes never win, and nobody wins a
+    position without seats.
+    """
+    if seats <= 0:
+        return WinnerSelection([], [], 0)
+    leaders = heapq.nlargest(seats, (c for c in candidates if c.votes > 0), key=lambda c: c.votes)
+    if len(leaders) < seats:
+        return WinnerSelection(leaders, [], seats - len(leaders))
+    cutoff = leaders[-1].votes
+    winners = [c for c in leaders if c.votes > cutoff]
+    at_cutoff = [c for c in candidates if c.votes == cutoff]
+    seats_left = seats - len(winners)
+    if len(at_cutoff) <= seats_left:
+        return WinnerSelection(winners + at_cutoff, [], seats_left - len(at_cutoff))
+    return WinnerSelection(winners, at_cutoff, seats_left)
+
+
+class PositionResult:
+    """Vote counts of one position, in ballot order, with the winning candidates
+
+    On a ranked position the counts are first preferences and the winners
+    come from ``tabulation``, whose rounds show how they were reached. Ties
+    its rounds settled by ballot order are reported in ``tied``.
+    """
+
+    def __init__(self, position, candidates, tabulation=None):
+        self.position = position
+        self.candidates = candidates
+        self.total_votes = sum(candidate.votes for candidate in candidates)
+        self.tabulation = tabulation
+        if tabulation is None:
+            self.selection = select_winners(candidates, position.max_vote)
+        else:
+            by_id = {candidate.id: candidate for candidate in candidates}
+            winners = [by_id[candidate_id] for candidate_id in tabulation.elected]
+            tied = dict.fromkeys(c for count in tabulation.rounds for c in count.tied)
+            self.selection = WinnerSelection(
+                winners, [by_id[candidate_id] for candidate_id in tied], position.max_vote - len(winners))
+        self.winners = self.selection.winners
+        self.tied = self.selection.tied
+
+    @property
+    def ranking(self):
+        return sorted(self.candidates, key=lambda c: (-c.votes, c.name))
+
+
+def vote_counts(election_id):
+    """Map candidate id to first-preference count with one grouped query over Votes"""
+    return dict(Votes.objects.filter(election_id=election_id, rank=1).values_list(
+        'candidate_id').annotate(total=Count('id')))
+
+
+def ranked_tabulations(ballot, positions):
+    """Tabulate the ranked ``positions`` of a ballot, keyed by position id
+
+    Rankings are read in one query, ordered so each voter's preferences
+    on a position arrive together and in rank order.
+    """
+    rows = Votes.objects.filter(position_id__in=[p.id for p in positions]).order_by(
+        'position_id', 'voter_id', 'rank').values_list('position_id', 'voter_id', 'candidate_id')
+    rankings = {position.id: [] for position in positions}
+    for (position_id, voter_id), votes in groupby(rows.iterator(), key=lambda row: row[:2]):
+        rankings[position_id].append(tuple(vote[2] for vote in votes))
+    return {
+        position.id: tabulate(RankedBallots(
+            [c.id for c in ballot.candidates_for(position)], rankings.pop(position.id)
+        ), position.max_vote)
+        for position in positions
+    }
+
+
+RESULT_SOURCES = {
+    'tally': tally_counts,
+    'votes': vote_counts,
+}
+if np is not None:
+    RESULT_SOURCES['numpy'] = numpy_counts
+
+
+def election_results(election_id, source='tally'):
+    """Full tally of an election as a list of PositionResult in ballot order
+
+    ``source`` picks where counts come from: the maintained CandidateTally
+    rows, a grouped aggregate over Votes, or, with NumPy installed, Votes
+    streamed through numpy.bincount. Ranked positions are also tabulated
+    from their full rankings, one more query whatever the source.
+    """
+    ballot = load_ballot(election_id)
+    counts = RESULT_SOURCES[source](election_id)
+    ranked = [p for p in ballot.positions if p.voting_method == Position.RANKED]
+    tabulations = ranked_tabulations(ballot, ranked) if ranked else {}
+    return [
+        PositionResult(position, [
+            CandidateResult(candidate.id, candidate.fullname, counts.get(candidate.id, 0))
+            for candidate in ballot.candidates_for(position)
+        ], tabulations.get(position.id))
+        for position in ballot.positions
+    ]
+
+
+def results_version(election_id):
+    """Digest that changes whenever the ballot, any candidate total or any vote of an election changes
+
+    Tallies only hold first preferences, so the number of votes and the
+    newest vote id are mixed in too: a re-vote with the same first
+    preferences but other later ones still moves the digest.
+    """
+    ballot_version = Election.objects.filter(id=election_id).values_list(
+        'ballot_version', flat=True).first()
+    votes = Votes.objects.filter(election_id=election_id).aggregate(count=Count('id'), last_id=Max('id'))
+    digest = hashlib.sha1(f"{election_id}:{ballot_version}:{votes['count']}:{votes['last_id']}".encode())
+    tallies = CandidateTally.objects.filter(election_id=election_id).order_by(
+        'candidate_id').values_list('candidate_id', 'count')
+    for candidate_id, count in tallies:
+        digest.update(f":{candidate_id}={count}".encode())
+    return digest.hexdigest()
+
+
+def results_source(source=None):
+    """``source`` if it names an available result source, else the RESULTS_SOURCE setting
+
+    A setting naming a source that is not available here, such as numpy
+    without NumPy installed, falls back to the maintained tallies.
+    """
+    if source in RESULT_SOURCES:
+        return source
+    source = getattr(settings, 'RESULTS_SOURCE', 'tally')
+    return source if source in RESULT_SOURCES else 'tally'
@@ -0,0 +1,37 @@
+from itertools import islice
+from .models import Candidate, Votes
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see RESULT_SOURCES
+    np = None
+
+VOTE_CHUNK_SIZE = 100000
+
+
+def numpy_counts(election_id, chunk_size=VOTE_CHUNK_SIZE):
+    """Map candidate id to first-preference count by streaming Votes through numpy.bincount
+
+    Candidate ids are read off a server-side cursor ``chunk_size`` rows at a
+    time, mapped onto dense indexes and counted per chunk, so memory stays
+    flat however many votes the election holds.
+    """
+    candidate_ids = np.fromiter(
+        Candidate.objects.filter(position__election_id=election_id).order_by(
+            'id').values_list('id', flat=True),
+        dtype=np.int64)
+    if not candidate_ids.size:
+        return {}
+    totals = np.zeros(candidate_ids.size, dtype=np.int64)
+
+    rows = Votes.objects.filter(election_id=election_id, rank=1).values_list(
+        'candidate_id', flat=True).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = np.fromiter(islice(rows, chunk_size), dtype=np.int64)
+        if not chunk.size:
+            break
+        # A candidate added since the ids were read sorts past the end; drop it
+        counts = np.bincount(np.searchsorted(candidate_ids, chunk), minlength=candidate_ids.size + 1)
+        totals += counts[:candidate_ids.size]
+    voted = totals.nonzero()
+    return dict(zip(candidate_ids[voted].tolist(), totals[voted].tolist()))
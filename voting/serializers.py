@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Position, Candidate, Votes, Voter
+from .ballot import ElectionBallot
 from account.models import CustomUser
 
 
@@ -58,12 +59,11 @@ class BallotSerializer(serializers.Serializer):
     candidates = serializers.SerializerMethodField()
     
     def get_candidates(self, obj):
-        positions = obj.get('positions', [])
+        ballot = obj.get('ballot') or ElectionBallot(obj.get('positions', []))
         candidates_data = {}
-        for position in positions:
-            candidates = Candidate.objects.filter(position=position)
+        for position in ballot.positions:
             candidates_data[position.id] = CandidateSerializer(
-                candidates, many=True, context=self.context
+                ballot.candidates_for(position), many=True, context=self.context
             ).data
         return candidates_data
 
@@ -0,0 +1,54 @@
+from django.db.models import Count, F, Q
+from .models import Candidate, CandidateTally
+
+
+def record_votes(votes):
+    """Add freshly inserted votes to the candidate tallies
+
+    Tallies count first preferences, so lower ranks of a ranked ballot
+    are left out.
+    """
+    votes = [vote for vote in votes if vote.rank == 1]
+    if not votes:
+        return
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=vote.election_id,
+            position_id=vote.position_id,
+            candidate_id=vote.candidate_id,
+        )
+        for vote in votes
+    ], ignore_conflicts=True)
+    # A ballot holds each candidate at most once, so one UPDATE covers it
+    CandidateTally.objects.filter(
+        candidate_id__in=[vote.candidate_id for vote in votes]
+    ).update(count=F('count') + 1)
+
+
+def retract_votes(voter):
+    """Take a voter's votes back out of the tallies before they are deleted"""
+    CandidateTally.objects.filter(
+        candidate__votes__voter=voter, candidate__votes__rank=1
+    ).update(count=F('count') - 1)
+
+
+def rebuild_tallies(election_id):
+    """Recompute every candidate tally of an election from the Votes table"""
+    counts = Candidate.objects.filter(position__election_id=election_id).values_list(
+        'id', 'position_id').annotate(total=Count('votes', filter=Q(votes__rank=1)))
+    CandidateTally.objects.filter(election_id=election_id).delete()
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=election_id,
+            position_id=position_id,
+            candidate_id=candidate_id,
+            count=total,
+        )
+        for candidate_id, position_id, total in counts
+    ])
+
+
+def tally_counts(election_id):
+    """Map candidate id to vote count for an election in a single query"""
+    return dict(CandidateTally.objects.filter(
+        election_id=election_id).values_list('candidate_id', 'count'))
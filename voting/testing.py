@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Position, Candidate, Voter, Votes
+from .tallies import record_votes
+
+
+def grow_ballot(election, positions=3, candidates=3, voters=5):
+    """Add positions, candidates and voters who vote on all of them to an election"""
+    start = Position.objects.filter(election=election).count()
+    new_positions = [
+        Position.objects.create(election=election, name=f"Extra {start + p}", max_vote=1 + p % 2,
+                                priority=start + p + 1)
+        for p in range(positions)
+    ]
+    for position in new_positions:
+        for c in range(candidates):
+            Candidate.objects.create(position=position, fullname=f"{position.name} candidate {c}", bio="Bio")
+    ballot = Candidate.objects.filter(position__in=new_positions)
+    for v in range(voters):
+        voter = Voter.objects.create(election=election, sin=f"{election.id}-{start}-{v}", voted=True)
+        votes = Votes.objects.bulk_create([
+            Votes(election=election, voter=voter, position_id=candidate.position_id, candidate=candidate)
+            for candidate in ballot
+            if candidate.fullname.endswith(" candidate 0")
+        ])
+        record_votes(votes)
+
+
+class QueryBudgetMixin:
+    """Pins the number of queries a view issues, whatever the size of the ballot"""
+
+    def count_queries(self, func, prepare=None):
+        args = (prepare(),) if prepare else ()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            func(*args)
+        return queries
+
+    def assertQueryBudget(self, budget, func, grow, prepare=None):
+        """Fail unless ``func`` runs at most ``budget`` queries, and just as many after ``grow()``
+
+        The cache is cleared before each call so the uncached path is
+        measured. ``prepare``, if given, runs unmeasured and its result is
+        passed to ``func``.
+        """
+        small = self.count_queries(func, prepare)
+        grow()
+        large = self.count_queries(func, prepare)
+        listing = "\n".join(query['sql'] for query in large.captured_queries)
+        self.assertEqual(len(small), len(large),
+                         f"Query count grows with the ballot ({len(small)} -> {len(large)}):\n{listing}")
+        self.assertLessEqual(len(large), budget, f"{len(large)} queries over a budget of {budget}:\n{listing}")
@@ -1,10 +1,30 @@
+import json
+import random
+from datetime import timedelta
+from unittest import skipUnless
+from django.conf import settings
 from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection, transaction, IntegrityError
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from voting.models import Election, Position, Candidate, Voter, Votes
+from django.utils import timezone
+from voting.models import Election, Position, Candidate, Voter, Votes, CandidateTally, renumber_positions
+from voting.views import generate_ballot, get_ballot
+from voting.ballot import load_ballot, ballot_etag, get_ballot_payload
+from voting.tallies import rebuild_tallies, tally_counts
+from voting.voter_import import import_voters
+from voting.query_plans import check_query_plans, full_scans
+from voting.benchmark import ballot_form, percentile, seed_elections, seed_votes, summarize
+from voting.testing import QueryBudgetMixin, grow_ballot
+from voting.results import CandidateResult, election_results, results_source, select_winners
+from voting.results_numpy import np, numpy_counts
+from voting.ranked import RankedBallots, tabulate
 from account.models import CustomUser
 
 class SINVotingTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = CustomUser.objects.create(email="admin@test.com", password="password")
         self.election = Election.objects.create(title="Test Election", created_by=self.user)
@@ -86,3 +106,599 @@ class SINVotingTests(TestCase):
         Election.objects.create(title="Election 2", created_by=self.user)
         response = self.client.get(reverse('voter_login'))
         self.assertRedirects(response, reverse('index'))
+
+
+class BallotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.position = Position.objects.create(election=self.election, name="President", max_vote=1, priority=1)
+        self.candidate = Candidate.objects.create(fullname="Candidate A", position=self.position, bio="Bio")
+
+    def test_cached_ballot_needs_no_queries(self):
+        self.election.refresh_from_db()
+        first = get_ballot(self.election)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_ballot(self.election), first)
+
+    def test_candidate_change_invalidates_ballot(self):
+        self.election.refresh_from_db()
+        self.assertIn("Candidate A", get_ballot(self.election))
+        Candidate.objects.create(fullname="Candidate B", position=self.position, bio="Bio")
+        self.election.refresh_from_db()
+        self.assertIn("Candidate B", get_ballot(self.election))
+
+    def test_position_delete_invalidates_ballot(self):
+        self.election.refresh_from_db()
+        self.assertIn("President", get_ballot(self.election))
+        self.position.delete()
+        self.election.refresh_from_db()
+        self.assertNotIn("President", get_ballot(self.election))
+
+
+class PositionPriorityTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.first = Position.objects.create(election=self.election, name="President", max_vote=1, priority=3)
+        self.second = Position.objects.create(election=self.election, name="Secretary", max_vote=1, priority=7)
+
+    def test_generate_ballot_is_read_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            generate_ballot(self.election.id)
+        self.assertTrue(all(q['sql'].startswith('SELECT') for q in ctx.captured_queries))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.priority, 3)
+
+    def test_renumber_positions_closes_gaps(self):
+        renumber_positions(self.election.id)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.priority, self.second.priority), (1, 2))
+
+
+class BallotLoaderTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        for i in range(5):
+            position = Position.objects.create(election=self.election, name=f"Position {i}", max_vote=2, priority=i + 1)
+            for j in range(3):
+                Candidate.objects.create(fullname=f"Candidate {i}-{j}", position=position, bio="Bio")
+
+    def test_load_ballot_indexes_candidates(self):
+        with self.assertNumQueries(2):
+            ballot = load_ballot(self.election.id)
+        position = ballot.positions[0]
+        candidate = ballot.candidates_for(position)[0]
+        self.assertEqual(ballot.candidate_index[candidate.id], (position, candidate.fullname))
+        self.assertEqual(ballot.get_candidate(position, str(candidate.id)), candidate)
+        self.assertIsNone(ballot.get_candidate(ballot.positions[1], candidate.id))
+        self.assertIsNone(ballot.get_candidate(position, "not-an-id"))
+
+    def test_generate_ballot_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            generate_ballot(self.election.id)
+
+    def test_preview_vote_query_count_is_constant(self):
+        ballot = load_ballot(self.election.id)
+        data = {'election_id': self.election.id}
+        for position in ballot.positions:
+            data[f"position-{position.priority - 1}[]"] = [c.id for c in ballot.candidates_for(position)[:2]]
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('preview_vote'), data)
+        self.assertFalse(response.json()['error'])
+
+
+class SubmitBallotTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.president = Position.objects.create(election=self.election, name="President", max_vote=1, priority=1)
+        self.council = Position.objects.create(election=self.election, name="Council", max_vote=2, priority=2)
+        self.candidate = Candidate.objects.create(fullname="Candidate A", position=self.president, bio="Bio")
+        self.members = [
+            Candidate.objects.create(fullname=f"Member {i}", position=self.council, bio="Bio")
+            for i in range(3)
+        ]
+
+    def test_submit_writes_all_selections(self):
+        self.client.post(reverse('submit_ballot'), {
+            'sin': "111",
+            'election_id': self.election.id,
+            'president': self.candidate.id,
+            'council[]': [self.members[0].id, self.members[1].id],
+        })
+        voter = Voter.objects.get(sin="111", election=self.election)
+        self.assertTrue(voter.voted)
+        self.assertEqual(Votes.objects.filter(voter=voter).count(), 3)
+        self.assertEqual(Votes.objects.filter(voter=voter, election=self.election).count(), 3)
+
+    async def test_submit_through_asgi(self):
+        response = await self.async_client.post(reverse('submit_ballot'), {
+            'sin': "666",
+            'election_id': self.election.id,
+            'president': self.candidate.id,
+            'council[]': [self.members[2].id],
+        })
+        self.assertEqual(response.status_code, 302)
+        voter = await Voter.objects.aget(sin="666", election=self.election)
+        self.assertTrue(voter.voted)
+        self.assertEqual(await Votes.objects.filter(voter=voter).acount(), 2)
+        response = await self.async_client.get(reverse('show_ballot', args=[self.election.id]))
+        self.assertContains(response, "Member 2")
+
+    def test_save_fills_election_from_position(self):
+        voter = Voter.objects.create(sin="555", election=self.election)
+        vote = Votes.objects.create(voter=voter, position=self.president, candidate=self.candidate)
+        self.assertEqual(vote.election_id, self.election.id)
+
+    def test_invalid_selection_writes_nothing(self):
+        self.client.post(reverse('submit_ballot'), {
+            'sin': "222",
+            'election_id': self.election.id,
+            'president': self.candidate.id,
+            'council[]': [self.members[0].id, self.candidate.id],
+        })
+        voter = Voter.objects.get(sin="222", election=self.election)
+        self.assertFalse(voter.voted)
+        self.assertFalse(Votes.objects.filter(voter=voter).exists())
+
+    def test_duplicate_selection_is_rejected(self):
+        self.client.post(reverse('submit_ballot'), {
+            'sin': "333",
+            'election_id': self.election.id,
+            'council[]': [self.members[0].id, self.members[0].id],
+        })
+        self.assertFalse(Votes.objects.exists())
+
+    def test_duplicate_spelled_differently_is_rejected(self):
+        response = self.client.post(reverse('submit_ballot'), {
+            'sin': "334",
+            'election_id': self.election.id,
+            'council[]': [str(self.members[0].id), f"0{self.members[0].id}"],
+        }, follow=True)
+        self.assertContains(response, "browse the system properly")
+        self.assertNotContains(response, "You have voted already")
+        self.assertFalse(Voter.objects.get(sin="334", election=self.election).voted)
+
+    def test_votes_are_unique_per_voter_and_candidate(self):
+        voter = Voter.objects.create(sin="444", election=self.election)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Votes.objects.bulk_create([
+                Votes(election=self.election, voter=voter, position=self.president, candidate=self.candidate),
+                Votes(election=self.election, voter=voter, position=self.president, candidate=self.candidate),
+            ])
+
+
+class CandidateTallyTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.council = Position.objects.create(election=self.election, name="Council", max_vote=2, priority=1)
+        self.members = [
+            Candidate.objects.create(fullname=f"Member {i}", position=self.council, bio="Bio")
+            for i in range(3)
+        ]
+
+    def vote(self, sin, *candidates):
+        self.client.post(reverse('submit_ballot'), {
+            'sin': sin,
+            'election_id': self.election.id,
+            'council[]': [candidate.id for candidate in candidates],
+        })
+
+    def test_submission_updates_tallies(self):
+        self.vote("1", self.members[0], self.members[1])
+        self.vote("2", self.members[0])
+        counts = tally_counts(self.election.id)
+        self.assertEqual(counts, {self.members[0].id: 2, self.members[1].id: 1})
+
+    def test_rebuild_matches_votes(self):
+        self.vote("1", self.members[0], self.members[1])
+        CandidateTally.objects.update(count=99)
+        rebuild_tallies(self.election.id)
+        counts = tally_counts(self.election.id)
+        self.assertEqual(counts, {self.members[0].id: 1, self.members[1].id: 1, self.members[2].id: 0})
+
+
+class ElectionResultsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.council = Position.objects.create(election=self.election, name="Council", max_vote=2, priority=1)
+        self.members = [
+            Candidate.objects.create(fullname=f"Member {i}", position=self.council, bio="Bio")
+            for i in range(4)
+        ]
+        for sin, picks in [("1", [0, 1]), ("2", [0, 2]), ("3", [0]), ("4", [1, 2])]:
+            self.client.post(reverse('submit_ballot'), {
+                'sin': sin,
+                'election_id': self.election.id,
+                'council[]': [self.members[i].id for i in picks],
+            })
+
+    def test_sources_agree(self):
+        by_tally = election_results(self.election.id, source='tally')
+        by_votes = election_results(self.election.id, source='votes')
+        self.assertEqual(by_tally[0].candidates, by_votes[0].candidates)
+
+    def test_results_query_count(self):
+        with self.assertNumQueries(3):
+            election_results(self.election.id, source='votes')
+
+    @skipUnless(np, "numpy is not installed")
+    def test_numpy_counts_match_tallies(self):
+        self.assertEqual(numpy_counts(self.election.id, chunk_size=3), tally_counts(self.election.id))
+        by_numpy = election_results(self.election.id, source='numpy')
+        self.assertEqual(by_numpy[0].candidates, election_results(self.election.id)[0].candidates)
+        self.assertEqual([c.name for c in by_numpy[0].tied], ["Member 1", "Member 2"])
+
+    def test_unknown_source_falls_back_to_setting(self):
+        self.assertEqual(results_source('votes'), 'votes')
+        with self.settings(RESULTS_SOURCE='votes'):
+            self.assertEqual(results_source('bogus'), 'votes')
+            self.assertEqual(results_source(), 'votes')
+        with self.settings(RESULTS_SOURCE='bogus'):
+            self.assertEqual(results_source(), 'tally')
+            self.assertEqual(results_source('bogus'), 'tally')
+
+    def test_tie_at_last_seat(self):
+        result = election_results(self.election.id)[0]
+        self.assertEqual([c.votes for c in result.ranking], [3, 2, 2, 0])
+        self.assertEqual([c.name for c in result.winners], ["Member 0"])
+        self.assertEqual([c.name for c in result.tied], ["Member 1", "Member 2"])
+
+
+class SelectWinnersTests(TestCase):
+    def candidates(self, *votes):
+        return [CandidateResult(i, f"C{i}", v) for i, v in enumerate(votes)]
+
+    def test_clear_winners(self):
+        selection = select_winners(self.candidates(5, 9, 1, 7), 2)
+        self.assertEqual([c.votes for c in selection.winners], [9, 7])
+        self.assertEqual(selection.tied, [])
+
+    def test_tie_group_at_boundary(self):
+        selection = select_winners(self.candidates(9, 4, 4, 4, 1), 2)
+        self.assertEqual([c.votes for c in selection.winners], [9])
+        self.assertEqual([c.id for c in selection.tied], [1, 2, 3])
+        self.assertEqual(selection.seats_left, 1)
+
+    def test_tie_that_fits_the_seats(self):
+        selection = select_winners(self.candidates(9, 4, 4, 1), 3)
+        self.assertEqual([c.votes for c in selection.winners], [9, 4, 4])
+        self.assertEqual(selection.seats_left, 0)
+
+    def test_no_seats(self):
+        selection = select_winners(self.candidates(5, 3), 0)
+        self.assertEqual((selection.winners, selection.tied, selection.seats_left), ([], [], 0))
+
+    def test_no_votes_no_winners(self):
+        selection = select_winners(self.candidates(0, 0), 1)
+        self.assertEqual((selection.winners, selection.tied, selection.seats_left), ([], [], 1))
+
+
+class RankedTabulationTests(TestCase):
+    def test_identical_rankings_are_stored_once(self):
+        ballots = RankedBallots([10, 20, 30], [(10, 20)] * 3 + [(30,)] + [(99,)])
+        self.assertEqual(len(ballots), 2)
+        self.assertEqual(ballots.voters, 4)
+        self.assertEqual(list(ballots.preferences), [0, 1, 2])
+
+    def test_instant_runoff(self):
+        ballots = RankedBallots(["A", "B", "C"], [("A",)] * 8 + [("B", "C")] * 5 + [("C", "B")] * 4)
+        count = tabulate(ballots, 1)
+        self.assertEqual(count.elected, ["B"])
+        self.assertEqual(count.rounds[0].eliminated, "C")
+        self.assertEqual(count.rounds[0].transfers, {"B": 4})
+        self.assertEqual(count.rounds[1].totals, [("A", 8), ("B", 9)])
+
+    def test_surplus_transfers_at_fractional_value(self):
+        ballots = RankedBallots(["A", "B", "C", "D"], [("A", "B")] * 40 + [("A", "C")] * 20 + [("C",)] * 25 + [("D", "C")] * 15)
+        count = tabulate(ballots, 2)
+        self.assertEqual(count.quota, 34)
+        self.assertEqual(count.elected, ["A", "C"])
+        transfers = count.rounds[0].transfers
+        self.assertAlmostEqual(transfers["B"], 26 * 40 / 60)
+        self.assertAlmostEqual(transfers["C"], 26 * 20 / 60)
+
+    def test_exhausted_ballots(self):
+        ballots = RankedBallots(["A", "B", "C"], [("A",)] * 3 + [("B",)] * 2 + [("C",)] * 1 + [("C", "B")] * 1)
+        count = tabulate(ballots, 1)
+        self.assertEqual(count.rounds[0].eliminated, "C")
+        self.assertEqual(count.rounds[0].exhausted, 1)
+        self.assertEqual(count.rounds[1].totals, [("A", 3), ("B", 3)])
+        self.assertEqual(count.elected, ["A"])
+
+    def test_tie_for_last_uses_earlier_round(self):
+        ballots = RankedBallots(["A", "B", "C", "D"], [("A",)] * 6 + [("B",)] * 3 + [("C",)] * 2 + [("D", "C")] * 1)
+        count = tabulate(ballots, 1)
+        self.assertEqual(count.rounds[0].eliminated, "D")
+        # B and C are level at 3, but C trailed in round one
+        self.assertEqual(count.rounds[1].eliminated, "C")
+        self.assertEqual(count.rounds[1].tied, [])
+
+    def test_tie_settled_by_ballot_order_is_recorded(self):
+        ballots = RankedBallots(["A", "B", "C", "D"], [("A",)] * 2 + [("B",)] * 2 + [("C",)] * 3)
+        count = tabulate(ballots, 1)
+        # D has no votes, so dropping it first decides nothing
+        self.assertEqual((count.rounds[0].eliminated, count.rounds[0].tied), ("D", []))
+        self.assertEqual((count.rounds[1].eliminated, count.rounds[1].tied), ("B", ["A", "B"]))
+        self.assertEqual(count.elected, ["C"])
+
+    def test_no_ballots(self):
+        count = tabulate(RankedBallots([1, 2], []), 1)
+        self.assertEqual(count.elected, [])
+
+
+class RankedBallotTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        self.chair = Position.objects.create(election=self.election, name="Chair", max_vote=1, priority=1,
+                                             voting_method=Position.RANKED)
+        self.candidates = [
+            Candidate.objects.create(fullname=f"Candidate {i}", position=self.chair, bio="Bio")
+            for i in range(3)
+        ]
+
+    def vote(self, sin, *ranking):
+        return self.client.post(reverse('submit_ballot'), {
+            'sin': sin,
+            'election_id': self.election.id,
+            'chair[]': [c.id if c else '' for c in ranking],
+        })
+
+    def test_ballot_offers_a_choice_per_rank(self):
+        markup = generate_ballot(self.election.id)
+        self.assertEqual(markup.count('name="chair[]"'), 3)
+        self.assertIn("Rank the candidates", markup)
+
+    def test_submit_stores_ranks(self):
+        a, b, c = self.candidates
+        self.vote("1", c, None, a)
+        votes = Votes.objects.filter(voter__sin="1").order_by('rank')
+        self.assertEqual([(v.candidate_id, v.rank) for v in votes], [(c.id, 1), (a.id, 2)])
+        self.assertEqual(tally_counts(self.election.id), {c.id: 1})
+
+    def test_blank_ranking_is_rejected(self):
+        self.vote("1", None, None, None)
+        self.assertFalse(Votes.objects.exists())
+        self.assertFalse(Voter.objects.get(sin="1").voted)
+        self.vote("1", self.candidates[0])
+        self.assertEqual(Votes.objects.filter(voter__sin="1").count(), 1)
+
+    def test_repeated_candidate_is_rejected(self):
+        a, b, c = self.candidates
+        self.vote("1", a, a)
+        self.assertFalse(Votes.objects.exists())
+        response = self.client.post(reverse('preview_vote'), {
+            'election_id': self.election.id, 'chair[]': [a.id, a.id]})
+        self.assertTrue(response.json()['error'])
+
+    def test_preview_lists_ranking_in_order(self):
+        a, b, c = self.candidates
+        response = self.client.post(reverse('preview_vote'), {
+            'election_id': self.election.id, 'chair[]': [b.id, a.id, '']})
+        listing = response.json()['list']
+        self.assertLess(listing.index("Candidate 1"), listing.index("Candidate 0"))
+        self.assertNotIn("Candidate 2", listing)
+
+    def test_results_follow_transfers(self):
+        a, b, c = self.candidates
+        for i, ranking in enumerate([(a,), (a,), (b, c), (c, b), (c, b)]):
+            self.vote(str(i), *ranking)
+        result, = election_results(self.election.id, source='votes')
+        self.assertEqual([x.votes for x in result.candidates], [2, 1, 2])
+        self.assertEqual([w.name for w in result.winners], ["Candidate 2"])
+        self.assertEqual(result.tied, [])
+        self.assertEqual(result.tabulation.rounds[0].eliminated, b.id)
+
+    def test_results_report_ballot_order_ties(self):
+        a, b, c = self.candidates
+        for i, ranking in enumerate([(a,), (b,), (c,), (c,)]):
+            self.vote(str(i), *ranking)
+        result, = election_results(self.election.id)
+        self.assertEqual([w.name for w in result.winners], ["Candidate 2"])
+        self.assertEqual([t.name for t in result.tied], ["Candidate 0", "Candidate 1"])
+
+    def test_results_query_count(self):
+        with self.assertNumQueries(4):
+            election_results(self.election.id, source='votes')
+
+
+class VoterImportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+
+    def test_queries_per_chunk(self):
+        lines = (f"{sin}\n" for sin in range(1000, 1100))
+        reports = []
+        # One existence check and one insert per chunk of 25
+        with self.assertNumQueries(8):
+            stats = import_voters(self.election, lines, chunk_size=25, progress=reports.append)
+        self.assertEqual((stats.rows, stats.created), (100, 100))
+        self.assertEqual(len(reports), 4)
+        self.assertEqual(Voter.objects.filter(election=self.election).count(), 100)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name, plan, scans in check_query_plans():
+            self.assertEqual(scans, [], f"{name}:\n{plan}")
+
+    def test_full_scan_detection(self):
+        plan = "SCAN voting_votes\nSEARCH voting_position USING INDEX p (election_id=?)"
+        self.assertEqual(full_scans(plan, 'sqlite'), ['voting_votes'])
+        self.assertEqual(full_scans("SCAN voting_votes USING COVERING INDEX v", 'sqlite'), [])
+        self.assertEqual(full_scans("Seq Scan on voting_voter  (cost=0.00..1.01)", 'postgresql'), ['voting_voter'])
+
+
+class BenchmarkFixtureTests(TestCase):
+    def test_seeded_ballot_is_accepted(self):
+        admin = CustomUser.objects.create(email="admin@test.com", password="password")
+        election, = seed_elections(admin, elections=1, positions=3, candidates=4, voters=10)
+        self.assertEqual(Candidate.objects.filter(position__election=election).count(), 12)
+        self.assertEqual(Voter.objects.filter(election=election).count(), 10)
+
+        data = ballot_form(load_ballot(election.id), election.id, random.Random(0))
+        data['sin'] = Voter.objects.filter(election=election).first().sin
+        self.client.post(reverse('submit_ballot'), data)
+        self.assertEqual(Votes.objects.filter(election=election).count(), 4)
+
+    def test_seed_votes(self):
+        admin = CustomUser.objects.create(email="admin@test.com", password="password")
+        election, = seed_elections(admin, elections=1, positions=3, candidates=4, voters=0)
+        self.assertEqual(seed_votes(election, 10, batch_size=2), 12)
+        self.assertEqual(Voter.objects.filter(election=election, voted=True).count(), 4)
+        self.assertEqual(sum(tally_counts(election.id).values()), 12)
+
+    def test_percentile(self):
+        self.assertEqual(percentile(list(range(101)), 95), 95)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summary_without_query_counts(self):
+        summary = summarize([(0.01, None, True), (0.03, None, False)], wall=0.5)
+        self.assertEqual((summary['requests'], summary['errors'], summary['throughput_rps']), (2, 1, 4.0))
+        self.assertNotIn('queries_per_request', summary)
+        self.assertEqual(summarize([(0.01, 3, True)], wall=1)['queries_per_request'], 3)
+
+
+class VoterQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        grow_ballot(self.election, positions=1, candidates=2, voters=1)
+        self.sins = iter(range(1000, 2000))
+
+    def grow(self):
+        grow_ballot(self.election, positions=4, candidates=5, voters=10)
+
+    def ballot_data(self):
+        return ballot_form(load_ballot(self.election.id), self.election.id, random.Random(0))
+
+    def test_show_ballot(self):
+        url = reverse('show_ballot', args=[self.election.id])
+        self.assertQueryBudget(4, lambda: self.client.get(url), self.grow)
+
+    def test_preview_vote(self):
+        self.assertQueryBudget(2, lambda data: self.client.post(reverse('preview_vote'), data),
+                               self.grow, prepare=self.ballot_data)
+
+    def test_submit_ballot(self):
+        def prepare():
+            data = self.ballot_data()
+            data['sin'] = str(next(self.sins))
+            return data
+        self.assertQueryBudget(14, lambda data: self.client.post(reverse('submit_ballot'), data),
+                               self.grow, prepare=prepare)
+
+    def test_voter_dashboard(self):
+        voter = Voter.objects.filter(election=self.election, voted=True).first()
+        session = self.client.session
+        session['voter_id'] = voter.id
+        session.save()
+
+        def grow():
+            self.grow()
+            for candidate in Candidate.objects.filter(position__election=self.election, votes__isnull=True):
+                Votes.objects.create(voter=voter, position_id=candidate.position_id, candidate=candidate)
+        self.assertQueryBudget(6, lambda: self.client.get(reverse('voterDashboard')), grow)
+
+
+class BallotPayloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        grow_ballot(self.election, positions=3, candidates=3, voters=0)
+
+    def test_payload_is_built_once_per_version(self):
+        with self.assertNumQueries(2):
+            payload = json.loads(get_ballot_payload(self.election))
+        self.assertEqual(len(payload['positions']), 3)
+        self.assertEqual(sum(len(c) for c in payload['candidates'].values()), 9)
+        with self.assertNumQueries(0):
+            get_ballot_payload(self.election)
+
+    def test_etag_follows_ballot_edits(self):
+        etag = ballot_etag(self.election)
+        Candidate.objects.create(fullname="Late entry", position=Position.objects.first(), bio="Bio")
+        self.election.refresh_from_db()
+        self.assertNotEqual(ballot_etag(self.election), etag)
+        payload = json.loads(get_ballot_payload(self.election))
+        self.assertEqual(sum(len(c) for c in payload['candidates'].values()), 10)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="admin@test.com", password="password")
+        self.election = Election.objects.create(title="Test Election", created_by=self.user)
+        grow_ballot(self.election, positions=2, candidates=2, voters=0)
+        self.url = reverse('show_ballot', args=[self.election.id])
+
+    def test_ballot_revalidates_with_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # The page holds a CSRF token: browsers may keep it, shared caches not
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('csrfmiddlewaretoken', response.content.decode())
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Candidate.objects.create(fullname="Late entry", position=Position.objects.first(), bio="Bio")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_ballot_revalidates_with_last_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_candidate_edits_move_last_modified(self):
+        Election.objects.filter(id=self.election.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        last_modified = self.client.get(self.url)['Last-Modified']
+        Candidate.objects.create(fullname="Late entry", position=Position.objects.first(), bio="Bio")
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_csrf_cookie_gets_a_fresh_page(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.cookies.pop(settings.CSRF_COOKIE_NAME)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_ballot_edits_move_last_modified(self):
+        updated_at = self.election.updated_at
+        Position.objects.filter(election=self.election).first().save()
+        self.election.refresh_from_db()
+        self.assertGreater(self.election.updated_at, updated_at)
+
+    def test_pages_with_messages_are_private(self):
+        # A rejected submission redirects back to the ballot with a message
+        self.client.post(reverse('submit_ballot'), {'election_id': self.election.id})
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_index_revalidates_with_etag(self):
+        Election.objects.create(title="Second Election", created_by=self.user)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('s-maxage', response['Cache-Control'])
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Election.objects.create(title="Third Election", created_by=self.user)
+        self.assertEqual(self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
@@ -1,54 +1,139 @@
 from django.shortcuts import render, redirect, reverse
 from account.views import voter_login, admin_login # Import correct views if needed, or just use redirection by URL name
-from .models import Position, Candidate, Voter, Votes, Election
+from .models import Position, Voter, Votes, Election
+from .ballot import load_ballot, aload_ballot, ballot_etag
+from .tallies import record_votes
 from django.http import JsonResponse
+from django.db import transaction, IntegrityError
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.middleware.csrf import get_token
 from django.utils.text import slugify
 from django.contrib import messages
 from django.conf import settings
 from django.utils import timezone
+from asgiref.sync import sync_to_async
+import hashlib
 import json
 
-def index(request):
-    # Retrieve all elections
-    elections = Election.objects.all()
-    if elections.count() == 1:
-        return redirect(reverse('show_ballot', args=[elections.first().id]))
+# Shared caches may serve a public page this long before revalidating;
+# browsers always revalidate, which costs a 304 when nothing changed
+PUBLIC_PAGE_MAX_AGE = 60
+
+
+def is_public_request(request):
+    """True when the page renders the same as for any anonymous visitor"""
+    return not request.user.is_authenticated and not messages.get_messages(request)
+
+
+def conditional_page(request, etag, last_modified, render_page, shared=True):
+    """Answer a GET with a 304 when the client's copy is current, else ``render_page()``
+
+    Only anonymous pages without flash messages carry validators. Of those,
+    ``shared`` pages may be stored by a shared cache; the others, such as
+    pages holding a CSRF token, only by the visitor's browser. Everything
+    else is private and uncached.
+    """
+    if not is_public_request(request):
+        response = render_page()
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render_page()
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    if shared:
+        patch_cache_control(response, public=True, max_age=0, s_maxage=PUBLIC_PAGE_MAX_AGE)
     else:
-        # If multiple elections, show a list (we'll implement this template later or simple render)
-        # For now, let's just render a simple list or redirect to the first one as a fallback
-        # Ideally, we should have an 'election_list' view.
-        return render(request, "voting/election_list.html", {'elections': elections})
+        patch_cache_control(response, private=True, no_cache=True)
+    # Sessions and message cookies change the page; keep them out of shared entries
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def csrf_etag(request, etag):
+    """``etag`` tied to the visitor's CSRF secret, for pages that embed a token
+
+    A browser holding a page whose token predates its current CSRF cookie
+    must get a fresh page rather than a 304.
+    """
+    get_token(request)  # Sets the secret up for a first visit too
+    secret = hashlib.sha1(request.META['CSRF_COOKIE'].encode()).hexdigest()[:12]
+    return f'{etag[:-1]}.{secret}"'
+
+
+def elections_etag():
+    state = Election.objects.aggregate(count=Count('id'), last_id=Max('id'), updated=Max('updated_at'))
+    updated = int(state['updated'].timestamp() * 1e6) if state['updated'] else 0
+    return f'"elections.{state["count"]}.{state["last_id"]}.{updated}"'
+
+
+def index(request):
+    def render_page():
+        # Retrieve all elections
+        elections = Election.objects.all()
+        if elections.count() == 1:
+            return redirect(reverse('show_ballot', args=[elections.first().id]))
+        else:
+            # If multiple elections, show a list (we'll implement this template later or simple render)
+            # For now, let's just render a simple list or redirect to the first one as a fallback
+            # Ideally, we should have an 'election_list' view.
+            return render(request, "voting/election_list.html", {'elections': elections})
+
+    # No Last-Modified: deleting an election leaves no newer timestamp behind
+    return conditional_page(request, elections_etag(), None, render_page)
 
 def generate_ballot(election_id, display_controls=False):
-    positions = Position.objects.filter(election_id=election_id).order_by('priority')
+    ballot = load_ballot(election_id)
+    positions = ballot.positions
     output = ""
     candidates_data = ""
-    num = 1
-    # return None
-    for position in positions:
+    for num, position in enumerate(positions, start=1):
         name = position.name
         position_name = slugify(name)
-        candidates = Candidate.objects.filter(position=position)
+        candidates = ballot.candidates_for(position)
+        ranked = position.voting_method == Position.RANKED
+        rankings = ''
+        if ranked:
+            instruction = "Rank the candidates in order of preference, for " + \
+                str(position.max_vote) + " seat" + ("s" if position.max_vote > 1 else "")
+            # One select per preference; they post in page order, so the
+            # list under position_name[] is the voter's ranking
+            options = ''.join(
+                '<option value="'+str(candidate.id)+'">'+candidate.fullname+'</option>' for candidate in candidates)
+            for rank in range(1, len(candidates) + 1):
+                rankings = rankings + '<li><select class="form-control ' + position_name + '" name="' + \
+                    position_name+"[]" + '"><option value="">Choice ' + str(rank) + '</option>' + options + '</select></li>'
+            rankings = '<ol>' + rankings + '</ol>'
+        elif position.max_vote > 1:
+            instruction = "You may select up to " + \
+                str(position.max_vote) + " candidates"
+        else:
+            instruction = "Select only one candidate"
         for candidate in candidates:
-            if position.max_vote > 1:
-                instruction = "You may select up to " + \
-                    str(position.max_vote) + " candidates"
+            if ranked:
+                input_box = ''
+            elif position.max_vote > 1:
                 input_box = '<input type="checkbox" value="'+str(candidate.id)+'" class="flat-red ' + \
                     position_name+'" name="' + \
                     position_name+"[]" + '">'
             else:
-                instruction = "Select only one candidate"
                 input_box = '<input value="'+str(candidate.id)+'" type="radio" class="flat-red ' + \
                     position_name+'" name="'+position_name+'">'
-            image = candidate.photo.url
+            image = candidate.photo.url if candidate.photo else ''
             candidates_data = candidates_data + '<li>' + input_box + '<button type="button" class="btn btn-primary btn-sm btn-flat clist platform" data-fullname="'+candidate.fullname+'" data-bio="'+candidate.bio+'"><i class="fa fa-search"></i> Platform</button><img src="' + \
                 image+'" height="100px" width="100px" class="clist"><span class="cname clist">' + \
                 candidate.fullname+'</span></li>'
         up = ''
-        if position.priority == 1:
+        if num == 1:
             up = 'disabled'
         down = ''
-        if position.priority == positions.count():
+        if num == len(positions):
             down = 'disabled'
         output = output + f"""<div class="row">	<div class="col-xs-12"><div class="box box-solid" id="{position.id}">
              <div class="box-header with-border">
@@ -71,37 +156,49 @@ def generate_ballot(election_id, display_controls=False):
         <ul>
         {candidates_data}
         </ul>
+        {rankings}
         </div>
         </div>
         </div>
         </div>
         </div>
         """
-        position.priority = num
-        position.save()
-        num = num + 1
         candidates_data = ''
     return output
 
 
+BALLOT_CACHE_TIMEOUT = 60 * 60
+
+
+def get_ballot(election, display_controls=False):
+    # Every voter in an election sees the same markup, so build it once per
+    # ballot version; editing a position or candidate bumps the version
+    key = f"ballot:{election.id}:{election.ballot_version}:{int(display_controls)}"
+    output = cache.get(key)
+    if output is None:
+        output = generate_ballot(election.id, display_controls=display_controls)
+        cache.set(key, output, BALLOT_CACHE_TIMEOUT)
+    return output
+
+
 def fetch_ballot(request):
     # This view seems to be used for admin preview mainly? 
     # Or voter? If voter, we need voter_id. If admin, we need admin_election_id.
     # Let's support both.
-    election_id = None
+    election = None
     if 'voter_id' in request.session:
         try:
-            voter = Voter.objects.get(id=request.session['voter_id'])
-            election_id = voter.election.id
+            voter = Voter.objects.select_related('election').get(id=request.session['voter_id'])
+            election = voter.election
         except:
              pass
     elif 'admin_election_id' in request.session:
-        election_id = request.session['admin_election_id']
+        election = Election.objects.filter(id=request.session['admin_election_id']).first()
         
-    if not election_id:
+    if not election:
         return JsonResponse("No election found", safe=False)
 
-    output = generate_ballot(election_id, display_controls=True)
+    output = get_ballot(election, display_controls=True)
     return JsonResponse(output, safe=False)
 
 
@@ -125,7 +222,8 @@ def dashboard(request):
     if voter.voted:
         # Filter votes by this voter IN THIS ELECTION (filtered by Voter, so implicit)
         context = {
-            'my_votes': Votes.objects.filter(voter=voter),
+            'my_votes': Votes.objects.filter(voter=voter).select_related('position__election', 'candidate').order_by(
+                'position__priority', 'position_id', 'rank'),
             'election': voter.election
         }
         return render(request, "voting/voter/result.html", context)
@@ -133,14 +231,16 @@ def dashboard(request):
         return redirect(reverse('show_ballot', args=[voter.election.id]))
 
 
-def show_ballot(request, election_id=None):
+# The voting views are async: under ASGI a voter waiting on the database no
+# longer holds a worker. Sessions, messages and template rendering are sync
+# and run through sync_to_async.
+async def show_ballot(request, election_id=None):
     if not election_id:
         messages.error(request, "No election specified")
         return redirect(reverse('index'))
 
-    try:
-        election = Election.objects.get(id=election_id)
-    except Election.DoesNotExist:
+    election = await Election.objects.filter(id=election_id).afirst()
+    if election is None:
         messages.error(request, "Election not found")
         return redirect(reverse('index'))
 
@@ -148,15 +248,20 @@ def show_ballot(request, election_id=None):
         messages.error(request, "This election is closed.")
         return redirect(reverse('index'))
 
-    ballot = generate_ballot(election.id, display_controls=False)
-    context = {
-        'ballot': ballot,
-        'election': election
-    }
-    return render(request, "voting/voter/ballot.html", context)
+    def render_page():
+        ballot = get_ballot(election, display_controls=False)
+        context = {
+            'ballot': ballot,
+            'election': election
+        }
+        return render(request, "voting/voter/ballot.html", context)
+
+    # The ballot form holds a CSRF token, so the page is private to the visitor
+    return await sync_to_async(conditional_page)(
+        request, csrf_etag(request, ballot_etag(election)), election.updated_at, render_page, shared=False)
 
 
-def preview_vote(request):
+async def preview_vote(request):
     if request.method != 'POST':
         error = True
         response = "Please browse the system properly"
@@ -177,12 +282,26 @@ def preview_vote(request):
         except:
              return JsonResponse({'error': True, 'list': "Invalid Election ID"})
 
-        positions = Position.objects.filter(election_id=election_id)
-        for position in positions:
+        ballot = await aload_ballot(election_id)
+        for position in ballot.positions:
             max_vote = position.max_vote
             pos = slugify(position.name)
             pos_id = position.id
-            if position.max_vote > 1:
+            if position.voting_method == Position.RANKED:
+                ranking = ballot.get_ranking(position, form.get(pos + "[]", []))
+                if ranking is None:
+                    error = True
+                    response = "Please, browse the system properly"
+                elif ranking:
+                    data = ''.join(f"<li>{candidate.fullname}</li>" for candidate in ranking)
+                    output += f"""
+                       <div class='row votelist' style='padding-bottom: 2px'>
+		                      	<span class='col-sm-4'><span class='pull-right'><b>{position.name} :</b></span></span>
+		                      	<span class='col-sm-8'><ol style='margin-left:-20px'>{data}</ol></span>
+		                    </div>
+                      <hr/>
+                    """
+            elif position.max_vote > 1:
                 this_key = pos + "[]"
                 form_position = form.get(this_key)
                 if form_position is None:
@@ -201,25 +320,26 @@ def preview_vote(request):
                     end_tag = "</ul></span></div><hr/>"
                     data = ""
                     for form_candidate_id in form_position:
-                        try:
-                            candidate = Candidate.objects.get(
-                                id=form_candidate_id, position=position)
+                        candidate = ballot.get_candidate(position, form_candidate_id)
+                        if candidate is None:
+                            error = True
+                            response = "Please, browse the system properly"
+                        else:
                             data += f"""
 		                      	<li><i class="fa fa-check-square-o"></i> {candidate.fullname}</li>
                             """
-                        except:
-                            error = True
-                            response = "Please, browse the system properly"
                     output += start_tag + data + end_tag
             else:
                 this_key = pos
                 form_position = form.get(this_key)
                 if form_position is None:
                     continue
-                try:
-                    form_position = form_position[0]
-                    candidate = Candidate.objects.get(
-                        position=position, id=form_position)
+                form_position = form_position[0]
+                candidate = ballot.get_candidate(position, form_position)
+                if candidate is None:
+                    error = True
+                    response = "Please, browse the system properly"
+                else:
                     output += f"""
                             <div class='row votelist' style='padding-bottom: 2px'>
 		                      	<span class='col-sm-4'><span class='pull-right'><b>{position.name} :</b></span></span>
@@ -227,9 +347,6 @@ def preview_vote(request):
 		                    </div>
                       <hr/>
                     """
-                except Exception as e:
-                    error = True
-                    response = "Please, browse the system properly"
     context = {
         'error': error,
         'list': output
@@ -237,7 +354,23 @@ def preview_vote(request):
     return JsonResponse(context, safe=False)
 
 
-def submit_ballot(request):
+def cast_ballot(voter, votes):
+    """Store a voter's votes and mark them as voted; False if they already had"""
+    try:
+        with transaction.atomic():
+            # Conditional UPDATE is the gate: of two concurrent submissions
+            # for the same SIN only one can flip voted from False to True
+            claimed = Voter.objects.filter(id=voter.id, voted=False).update(
+                voted=True, updated_at=timezone.now())
+            if claimed:
+                Votes.objects.bulk_create(votes)
+                record_votes(votes)
+    except IntegrityError:
+        claimed = False
+    return bool(claimed)
+
+
+async def submit_ballot(request):
     if request.method != 'POST':
         messages.error(request, "Please, browse the system properly")
         return redirect(reverse('index'))
@@ -268,7 +401,7 @@ def submit_ballot(request):
 
     # Verify Logic
     try:
-        election = Election.objects.get(id=election_id)
+        election = await Election.objects.aget(id=election_id)
     except Election.DoesNotExist:
         messages.error(request, "Invalid Election")
         return redirect(reverse('index'))
@@ -279,12 +412,12 @@ def submit_ballot(request):
 
     # Check if voter exists
     if election.require_registered_voters:
-        voter = Voter.objects.filter(sin=sin, election=election).first()
+        voter = await Voter.objects.filter(sin=sin, election=election).afirst()
         if not voter:
             messages.error(request, "SIN not registered for this election")
             return redirect(reverse('show_ballot', args=[election_id]))
     else:
-        voter, created = Voter.objects.get_or_create(sin=sin, election=election)
+        voter, created = await Voter.objects.aget_or_create(sin=sin, election=election)
     
     if voter.voted:
         messages.error(request, "You have voted already")
@@ -298,13 +431,23 @@ def submit_ballot(request):
         messages.error(request, "Please select at least one candidate")
         return redirect(reverse('show_ballot', args=[election_id]))
     
-    positions = Position.objects.filter(election_id=election.id)
-    form_count = 0
+    # Validate the whole ballot in memory before touching the database
+    ballot = await aload_ballot(election.id)
+    new_votes = []
     
-    for position in positions:
+    for position in ballot.positions:
         max_vote = position.max_vote
         pos = slugify(position.name)
-        pos_id = position.id
+        if position.voting_method == Position.RANKED:
+            ranking = ballot.get_ranking(position, form.get(pos + "[]", []))
+            if ranking is None:
+                messages.error(request, "Please, browse the system properly")
+                return redirect(reverse('show_ballot', args=[election_id]))
+            new_votes.extend(
+                Votes(election=election, voter=voter, position=position, candidate=candidate, rank=rank)
+                for rank, candidate in enumerate(ranking, start=1)
+            )
+            continue
         if position.max_vote > 1:
             this_key = pos + "[]"
             form_position = form.get(this_key)
@@ -314,50 +457,34 @@ def submit_ballot(request):
                 messages.error(request, "You can only choose " +
                                str(max_vote) + " candidates for " + position.name)
                 return redirect(reverse('show_ballot', args=[election_id]))
-            else:
-                for form_candidate_id in form_position:
-                    form_count += 1
-                    try:
-                        candidate = Candidate.objects.get(
-                            id=form_candidate_id, position=position)
-                        vote = Votes()
-                        vote.candidate = candidate
-                        vote.voter = voter
-                        vote.position = position
-                        vote.save()
-                    except Exception as e:
-                        messages.error(
-                            request, "Please, browse the system properly " + str(e))
-                        return redirect(reverse('show_ballot', args=[election_id]))
         else:
             this_key = pos
             form_position = form.get(this_key)
             if form_position is None:
                 continue
-            form_count += 1
-            try:
-                form_position = form_position[0]
-                candidate = Candidate.objects.get(
-                    position=position, id=form_position)
-                vote = Votes()
-                vote.candidate = candidate
-                vote.voter = voter
-                vote.position = position
-                vote.save()
-            except Exception as e:
-                messages.error(
-                    request, "Please, browse the system properly " + str(e))
-                return redirect(reverse('show_ballot', args=[election_id]))
-    
-    inserted_votes = Votes.objects.filter(voter=voter)
-    if (inserted_votes.count() != form_count):
-        inserted_votes.delete()
-        messages.error(request, "Please try voting again!")
+            form_position = form_position[:1]
+        candidates = [ballot.get_candidate(position, form_candidate_id) for form_candidate_id in form_position]
+        # Compare resolved ids, not the posted strings: "1" and "01" are the same candidate
+        if None in candidates or len({candidate.id for candidate in candidates}) != len(candidates):
+            messages.error(request, "Please, browse the system properly")
+            return redirect(reverse('show_ballot', args=[election_id]))
+        new_votes.extend(
+            Votes(election=election, voter=voter, position=position, candidate=candidate)
+            for candidate in candidates
+        )
+
+    # A ranked position posts its blank "Choice N" selects, so the form is
+    # never empty; a ballot that picks nobody must not use up the SIN
+    if not new_votes:
+        messages.error(request, "Please select at least one candidate")
         return redirect(reverse('show_ballot', args=[election_id]))
-    else:
-        voter.voted = True
-        voter.save()
-        messages.success(request, "Thanks for voting")
-        # Where to redirect after voting? 
-        # Maybe to a 'thank you' page or index.
-        return redirect(reverse('index'))
+
+    # Transactions are sync-only, so the write runs in one thread-bound call
+    claimed = await sync_to_async(cast_ballot)(voter, new_votes)
+    if not claimed:
+        messages.error(request, "You have voted already")
+        return redirect(reverse('show_ballot', args=[election_id]))
+    messages.success(request, "Thanks for voting")
+    # Where to redirect after voting? 
+    # Maybe to a 'thank you' page or index.
+    return redirect(reverse('index'))
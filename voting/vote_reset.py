@@ -0,0 +1,47 @@
+from django.db import transaction
+from .models import Voter, Votes
+from .tallies import rebuild_tallies
+
+RESET_BATCH_SIZE = 5000
+
+
+def delete_vote_batch(election_id, batch_size=RESET_BATCH_SIZE):
+    """Delete up to ``batch_size`` votes of an election with one plain DELETE"""
+    ids = list(Votes.objects.filter(election_id=election_id).order_by().values_list(
+        'id', flat=True)[:batch_size])
+    if ids:
+        # Votes has no signals or dependent rows, so the collector, which
+        # would load every row into memory first, can be skipped
+        Votes.objects.filter(id__in=ids)._raw_delete(Votes.objects.db)
+    return len(ids)
+
+
+def reset_votes(election_id, batch_size=RESET_BATCH_SIZE, progress=None):
+    """Delete every vote of an election, clear Voter.voted and rebuild its tallies
+
+    Votes go in batches that commit as they go, keeping each lock short and
+    letting ``progress(deleted, total)`` report real headway. Voters stay
+    marked as voted until the last step, which sweeps up anything cast in
+    the meantime, clears the flags and rebuilds the tallies in one
+    transaction. Returns the number of votes deleted.
+    """
+    total = Votes.objects.filter(election_id=election_id).count()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            count = delete_vote_batch(election_id, batch_size)
+        deleted += count
+        if progress:
+            progress(deleted, total)
+        if count < batch_size:
+            break
+
+    with transaction.atomic():
+        # Votes cast since the last batch
+        count = delete_vote_batch(election_id, batch_size)
+        while count:
+            deleted += count
+            count = delete_vote_batch(election_id, batch_size)
+        Voter.objects.filter(election_id=election_id, voted=True).update(voted=False)
+        rebuild_tallies(election_id)
+    return deleted
@@ -0,0 +1,76 @@
+import csv
+import time
+from .models import Voter
+
+IMPORT_CHUNK_SIZE = 2000
+SIN_MAX_LENGTH = Voter._meta.get_field('sin').max_length
+
+
+class ImportStats:
+    """Running counters of a voter roll import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.existing = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows: {self.created} added, {self.existing} already registered, "
+                f"{self.duplicates} duplicates, {self.invalid} invalid "
+                f"({self.rate:.0f} rows/s)")
+
+
+def import_voters(election, lines, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Register every SIN from CSV ``lines`` (first column) in an election's voter roll
+
+    Rows are consumed as an iterator and written a chunk at a time, so the
+    file is never held in memory. ``progress`` is called with the running
+    ImportStats after each chunk.
+    """
+    stats = ImportStats()
+    seen = set()
+    chunk = []
+
+    def flush():
+        existing = set(Voter.objects.filter(
+            election=election, sin__in=chunk).values_list('sin', flat=True))
+        new_voters = [Voter(election=election, sin=sin) for sin in chunk if sin not in existing]
+        # ignore_conflicts covers SINs registered concurrently since the lookup
+        Voter.objects.bulk_create(new_voters, ignore_conflicts=True)
+        stats.created += len(new_voters)
+        stats.existing += len(existing)
+        chunk.clear()
+        if progress:
+            progress(stats)
+
+    for row in csv.reader(lines):
+        if not row or not row[0].strip():
+            continue
+        sin = row[0].strip()
+        if stats.rows == 0 and sin.lower() == 'sin':
+            continue  # header
+        stats.rows += 1
+        if len(sin) > SIN_MAX_LENGTH:
+            stats.invalid += 1
+            continue
+        if sin in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(sin)
+        chunk.append(sin)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return stats